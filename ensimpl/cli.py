@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
 from enum import Enum
+import csv
 import os
 import sys
 import time
 from pathlib import Path
 
-import json
-
+import orjson
 import typer
 
 from typing import List, Optional
@@ -22,9 +22,87 @@ from ensimpl.utils import configure_logging, format_time, get_logger
 
 app = typer.Typer()
 
+LOG = get_logger()
+
 ensimpl_dbs = None
 ensimpl_dbs_dict = None
 
+# tabulate scans every cell to size columns, which is slow and unreadable
+# for large tables, use --format csv/tab/json for complete output
+PRETTY_MAX_ROWS = 10000
+
+SEARCH_HEADERS = [
+    'ID',
+    'SYMBOL',
+    'IDS',
+    'POSITION',
+    'MATCH_REASON',
+    'MATCH_VALUE'
+]
+
+GENE_HEADERS = [
+    'ID',
+    'VERSION',
+    'SPECIES',
+    'SYMBOL',
+    'NAME',
+    'SYNONYMS',
+    'EXTERNAL_IDS',
+    'CHR',
+    'START',
+    'END',
+    'STRAND'
+]
+
+# header lines for delimited output, search is unquoted, genes are quoted
+SEARCH_HEADER_LINES = {
+    'tab': '\t'.join(SEARCH_HEADERS) + '\n',
+    'csv': ','.join(SEARCH_HEADERS) + '\n'
+}
+
+GENE_HEADER_LINES = {
+    'tab': '"' + '"\t"'.join(GENE_HEADERS) + '"\n',
+    'csv': '"' + '","'.join(GENE_HEADERS) + '"\n'
+}
+
+
+def get_dbs_dict():
+    """Get the ensimpl databases, initializing them on first use so that
+    commands such as ``create`` do not need ``ENSIMPL_DIR``.  Database meta
+    information is cached beside the databases by :func:`dbs.init`, so a
+    repeated invocation does not open any of them.
+
+    Returns:
+        The dict of ensimpl databases keyed by 'release:species'.
+    """
+    global ensimpl_dbs
+    global ensimpl_dbs_dict
+
+    if ensimpl_dbs_dict is None:
+        ensimpl_dbs, ensimpl_dbs_dict = dbs.init()
+
+    return ensimpl_dbs_dict
+
+
+class JSONStream:
+    """Write a ``{"data": [...]}`` JSON document one row at a time so the
+    full result set never has to be held in memory.
+    """
+
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self.count = 0
+        self.out.write('{"data": [\n')
+
+    def write(self, row):
+        if self.count:
+            self.out.write(',\n')
+        self.out.write(orjson.dumps(row).decode())
+        self.count += 1
+
+    def close(self):
+        self.out.write('\n]}\n' if self.count else ']}\n')
+
 
 @app.command()
 def create(directory: Path = typer.Option(
@@ -46,7 +124,6 @@ def create(directory: Path = typer.Option(
     """
     try:
         configure_logging(verbose)
-        LOG = get_logger()
 
         if directory is None:
             directory = os.getcwd()
@@ -83,10 +160,9 @@ def info(release: str = typer.Option(
     """
     try:
         configure_logging(verbose)
-        LOG = get_logger()
         LOG.debug('Stats database...')
 
-        db = dbs.get_database(release, species, ensimpl_dbs_dict)
+        db = dbs.get_database(release, species, get_dbs_dict())
         db_meta = meta.db_meta(db)
         statistics = meta.stats(db)
 
@@ -100,6 +176,97 @@ def info(release: str = typer.Option(
         print(e)
 
 
+def _pos(match):
+    """Format the position of a search match as chromosome:start-end."""
+    return ''.join((match.chromosome, ':', str(match.position_start),
+                    '-', str(match.position_end)))
+
+
+def _ids(match):
+    """Format the external ids of a search match as db/db_id||..."""
+    return '||'.join(f'{e["db"]}/{e["db_id"]}'
+                     for e in match.external_ids or ())
+
+
+def _match_row(match):
+    """Build the output row for a search match."""
+    return (
+        match.ensembl_gene_id,
+        match.symbol,
+        _ids(match),
+        _pos(match),
+        match.match_reason,
+        match.match_value
+    )
+
+
+def _match_json(match):
+    """Build the JSON record for a search match."""
+    return {
+        'ID': match.ensembl_gene_id,
+        'SYMBOL': match.symbol,
+        'IDS': _ids(match),
+        'POSITION': _pos(match),
+        'MATCH_REASON': match.match_reason,
+        'MATCH_VALUE': match.match_value
+    }
+
+
+def _gene_row(r):
+    """Build the output row for a gene."""
+    return (
+        r['id'],
+        r.get('ensembl_version', ''),
+        r['species_id'],
+        r.get('symbol', ''),
+        r.get('name', ''),
+        '||'.join(r.get('synonyms') or ()),
+        '||'.join(f'{e["db"]}/{e["db_id"]}'
+                  for e in r.get('external_ids') or ()),
+        r['chromosome'],
+        r['start'],
+        r['end'],
+        r['strand']
+    )
+
+
+def _emit_gene_results(results, fmt):
+    """Write gene results from :func:`genesdb.get` to stdout.
+
+    Args:
+        results: The genes keyed by Ensembl ID.
+        fmt: One of 'tab', 'csv', 'json' or 'pretty'.
+    """
+    tbl = []
+
+    # pick the row writer once rather than testing the format per row
+    if fmt in ('tab', 'csv'):
+        writer = csv.writer(sys.stdout,
+                            delimiter='\t' if fmt == 'tab' else ',',
+                            quoting=csv.QUOTE_ALL, lineterminator='\n')
+        sys.stdout.write(GENE_HEADER_LINES[fmt])
+        emit = lambda r: writer.writerow(_gene_row(r))
+    elif fmt == 'json':
+        stream = JSONStream()
+        emit = stream.write
+    else:
+        emit = lambda r: tbl.append(_gene_row(r))
+
+    for i in results:
+        emit(results[i])
+
+    if fmt == 'json':
+        stream.close()
+    elif fmt == 'pretty':
+        truncated = len(tbl) > PRETTY_MAX_ROWS
+        if truncated:
+            LOG.warning(f'Showing {PRETTY_MAX_ROWS} of {len(tbl)} genes, '
+                        f'use --format for complete output')
+            tbl = tbl[:PRETTY_MAX_ROWS]
+        # skip tabulate's per cell number detection on large tables
+        print(tabulate(tbl, GENE_HEADERS, disable_numparse=truncated))
+
+
 class SearchOutput(str, Enum):
     tab = 'tab'
     csv = 'csv'
@@ -136,75 +303,48 @@ def search(term: str = typer.Argument(
     Search ensimpl database <filename> for <term>
     """
     configure_logging(verbose)
-    LOG = get_logger()
     LOG.info('Search database...')
 
     maximum = max if max >= 0 else None
 
     try:
-        db = dbs.get_database(release, species, ensimpl_dbs_dict)
+        db = dbs.get_database(release, species, get_dbs_dict())
 
-        LOG.debug(f'Database: {db}')
+        LOG.debug('Database: %s', db)
 
         tstart = time.time()
         results = searchdb.search(db, term, exact, maximum)
         tend = time.time()
 
-        LOG.debug(f'Number of Results: {results.num_results}')
-        count = 0
+        LOG.debug('Number of Results: %s', results.num_results)
 
         if len(results.matches) == 0:
             print('No results found')
             sys.exit()
 
-        headers = [
-            'ID', 
-            'SYMBOL', 
-            'IDS', 
-            'POSITION', 
-            'MATCH_REASON',
-            'MATCH_VALUE'
-        ]
         tbl = []
 
+        # pick the row writer once rather than testing the format per row
         if format.value in ('tab', 'csv'):
             delim = '\t' if format.value == 'tab' else ','
-            print(delim.join(headers))
+            sys.stdout.write(SEARCH_HEADER_LINES[format.value])
+            emit = lambda m: print(delim.join(map(str, _match_row(m))))
+        elif format.value == 'json':
+            stream = JSONStream()
+            emit = lambda m: stream.write(_match_json(m))
+        else:
+            emit = lambda m: tbl.append(_match_row(m))
 
+        # search has already applied the --max limit
         for match in results.matches:
-            line = list()
-            line.append(match.ensembl_gene_id)
-            line.append(match.symbol)
-
-            if match.external_ids:
-                ext_ids = []
-                for ids in match.external_ids:
-                    ext_ids.append(f'{ids["db"]}/{ids["db_id"]}')
-                line.append('||'.join(ext_ids))
-            else:
-                line.append('')
-
-            line.append(f'{match.chromosome}:{match.position_start}-{match.position_end}')
-            line.append(match.match_reason)
-            line.append(match.match_value)
-
-            if format.value in ('tab', 'csv'):
-                print(delim.join(map(str, line)))
-            elif format.value == 'json':
-                tbl.append(dict(zip(headers, line)))
-            else:
-                tbl.append(line)
-
-            count += 1
-            if count >= max > 0:
-                break
+            emit(match)
 
         if format.value in ('tab', 'csv'):
             pass
         elif format.value == 'json':
-            print(json.dumps({'data': tbl}, indent=4))
+            stream.close()
         else:
-            print(tabulate(tbl, headers))
+            print(tabulate(tbl, SEARCH_HEADERS))
 
         LOG.info(f'Search time: {format_time(tstart, tend)}')
 
@@ -235,90 +375,31 @@ def genes(release: str = typer.Option(
     """
     try:
         configure_logging(verbose)
-        LOG = get_logger()
-        LOG.debug(f'Release: {release}')
-        LOG.debug(f'Species: {species}')
-        LOG.debug(f'Format: {format}')
-        LOG.debug(f'IDs: {ids}')
+        LOG.debug('Release: %s', release)
+        LOG.debug('Species: %s', species)
+        LOG.debug('Format: %s', format)
+        LOG.debug('IDs: %s', ids)
 
         ensembl_ids = None
 
         if ids:
-            ensembl_ids = []
             with open(ids) as fd:
-                for row in fd:
-                    row = row.strip()
-                    if row:
-                        ensembl_ids.append(row.strip().split()[0])
-
-        db = dbs.get_database(release, species, ensimpl_dbs_dict)
-
+                data = fd.read()
 
+            # first whitespace delimited token of each non-blank line,
+            # duplicates removed while keeping the file order
+            ensembl_ids = list(dict.fromkeys(
+                line.split(None, 1)[0]
+                for line in data.splitlines() if line.strip()
+            ))
 
+        db = dbs.get_database(release, species, get_dbs_dict())
 
         tstart = time.time()
         results = genesdb.get(db, ids=ensembl_ids, details=True)
         tend = time.time()
 
-        headers = [
-            'ID', 
-            'VERSION', 
-            'SPECIES', 
-            'SYMBOL', 
-            'NAME', 
-            'SYNONYMS',
-            'EXTERNAL_IDS', 
-            'CHR', 
-            'START', 
-            'END', 
-            'STRAND'
-        ]
-
-        tbl = []
-
-        delim = '"\t"' if format.value == 'tab' else '","'
-
-        if format.value in ('tab', 'csv'):
-            print('"{}"'.format(delim.join(headers)))
-
-        for i in results:
-            r = results[i]
-            line = list()
-            line.append(r['id'])
-            line.append(r.get('ensembl_version', ''))
-            line.append(r['species_id'])
-            line.append(r.get('symbol', ''))
-            line.append(r.get('name', ''))
-            line.append('||'.join(r.get('synonyms', [])))
-
-            external_ids = r.get('external_ids', [])
-            external_ids_str = ''
-            if external_ids:
-                ext_ids_tmp = []
-                for ext in external_ids:
-                    ext_ids_tmp.append('{}/{}'.format(ext['db'], ext['db_id']))
-                external_ids_str = '||'.join(ext_ids_tmp)
-            line.append(external_ids_str)
-
-            line.append(r['chromosome'])
-            line.append(r['start'])
-            line.append(r['end'])
-            line.append(r['strand'])
-
-            if format.value in ('tab', 'csv'):
-                print('"{}"'.format(delim.join(map(str, line))))
-            elif format.value == 'json':
-                tbl.append(r)
-            else:
-                tbl.append(line)
-
-        if format.value in ('tab', 'csv'):
-            pass
-        elif format.value == 'json':
-            print(json.dumps({'data': tbl}, indent=2))
-        else:
-            print(tabulate(tbl, headers))
-        pass
+        _emit_gene_results(results, format.value)
 
         LOG.info(f'Search time: {format_time(tstart, tend)}')
     except Exception as e:
@@ -348,92 +429,27 @@ def gene(id: str = typer.Argument(
     """
     try:
         configure_logging(verbose)
-        LOG = get_logger()
-        LOG.debug(f'Release: {release}')
-        LOG.debug(f'Species: {species}')
-        LOG.debug(f'Format: {format}')
-        LOG.debug(f'ID: {id}')
+        LOG.debug('Release: %s', release)
+        LOG.debug('Species: %s', species)
+        LOG.debug('Format: %s', format)
+        LOG.debug('ID: %s', id)
 
         ensembl_ids = [id]
 
-        db = dbs.get_database(release, species, ensimpl_dbs_dict)
+        db = dbs.get_database(release, species, get_dbs_dict())
 
         tstart = time.time()
         results = genesdb.get(db, ids=ensembl_ids, details=True)
         tend = time.time()
 
-        headers = [
-            'ID', 
-            'VERSION', 
-            'SPECIES', 
-            'SYMBOL', 
-            'NAME', 
-            'SYNONYMS',
-            'EXTERNAL_IDS', 
-            'CHR', 
-            'START', 
-            'END', 
-            'STRAND'
-        ]
-
-        tbl = []
-
-        delim = '"\t"' if format.value == 'tab' else '","'
+        _emit_gene_results(results, format.value)
 
-        if format.value in ('tab', 'csv'):
-            print('"{}"'.format(delim.join(headers)))
-
-        for i in results:
-            r = results[i]
-            line = list()
-            line.append(r['id'])
-            line.append(r.get('ensembl_version', ''))
-            line.append(r['species_id'])
-            line.append(r.get('symbol', ''))
-            line.append(r.get('name', ''))
-            line.append('||'.join(r.get('synonyms', [])))
-
-            external_ids = r.get('external_ids', [])
-            external_ids_str = ''
-            if external_ids:
-                ext_ids_tmp = []
-                for ext in external_ids:
-                    ext_ids_tmp.append('{}/{}'.format(ext['db'], ext['db_id']))
-                external_ids_str = '||'.join(ext_ids_tmp)
-            line.append(external_ids_str)
-
-            line.append(r['chromosome'])
-            line.append(r['start'])
-            line.append(r['end'])
-            line.append(r['strand'])
-
-            if format.value in ('tab', 'csv'):
-                print('"{}"'.format(delim.join(map(str, line))))
-            elif format.value == 'json':
-                tbl.append(r)
-            else:
-                tbl.append(line)
-
-        if format.value in ('tab', 'csv'):
-            pass
-        elif format.value == 'json':
-            print(json.dumps({'data': tbl}, indent=2))
-        else:
-            print(tabulate(tbl, headers))
-        pass
-
-        LOG.info('Search time: {format(format_time(tstart, tend)}')
+        LOG.info(f'Search time: {format_time(tstart, tend)}')
     except Exception as e:
         print(e)
 
 
 def main():
-    data = dbs.init()
-    global ensimpl_dbs
-    ensimpl_dbs = data[0]
-    global ensimpl_dbs_dict
-    ensimpl_dbs_dict = data[1]
-
     app()
 
 
@@ -521,6 +521,13 @@ def finalize(db, ref):
         LOG.debug(sql)
         cursor.execute(sql)
 
+    LOG.info('Analyzing...')
+
+    # sqlite_stat1 lets the query planner order the multi-table joins
+    # by the real table and index sizes
+    cursor.execute('ANALYZE')
+    conn.commit()
+
     conn.row_factory = sqlite3.Row
 
     LOG.info('Checking...')
@@ -771,10 +778,15 @@ SQL_CREATE_TABLES = ['''
     )
 ''', '''
     CREATE VIRTUAL TABLE IF NOT EXISTS ensembl_search
-        USING fts4(ensembl_genes_lookup_key, lookup_value);
+        USING fts5(ensembl_genes_lookup_key UNINDEXED, lookup_value,
+                   content='ensembl_genes_lookup',
+                   content_rowid='ensembl_genes_lookup_key');
 ''']
 
-# NOTE: as of this time (10/2019) FTS5 cannot do phrase queries
+# NOTE: ensembl_search is an external content FTS5 index over
+# ensembl_genes_lookup, the text is not stored twice and the default
+# unicode61 tokenizer (no stemming) keeps the old FTS4 matching.  The lookup
+# table is only written while building, so no sync triggers are needed.
 
 SQL_INSERT_CHROMOSOMES = '''
     INSERT
@@ -979,9 +991,8 @@ SELECT distinct null,
 
 SQL_ENSEMBL_SEARCH_INSERT = '''
     INSERT
-      INTO ensembl_search
-    SELECT ensembl_genes_lookup_key, lookup_value
-      FROM ensembl_genes_lookup
+      INTO ensembl_search(ensembl_search)
+    VALUES ('rebuild')
 '''
 
 SQL_INDICES = [
@@ -995,8 +1006,8 @@ SQL_INDICES = [
     CREATE INDEX IF NOT EXISTS idx_gtpe_transcript_id 
     ON ensembl_gtpe(transcript_id ASC)
     ''', '''
-    CREATE INDEX IF NOT EXISTS idx_gtpe_ensembl_id 
-    ON ensembl_gtpe(ensembl_id ASC)
+    CREATE INDEX IF NOT EXISTS idx_gtpe_ensembl_id_gene_id 
+    ON ensembl_gtpe(ensembl_id ASC, gene_id ASC)
     ''', '''
     CREATE INDEX IF NOT EXISTS idx_gtpe_ensembl_id_version 
     ON ensembl_gtpe(ensembl_id_version ASC)
@@ -1025,6 +1036,9 @@ SQL_INDICES = [
     CREATE INDEX IF NOT EXISTS idx_ensembl_gene_id 
     ON ensembl_genes (ensembl_id ASC)
     ''', '''
+    CREATE INDEX IF NOT EXISTS idx_ensembl_genes_region 
+    ON ensembl_genes (chromosome ASC, start_position ASC, end_position ASC)
+    ''', '''
     CREATE INDEX IF NOT EXISTS idx_ensembl_gene_ids_ensembl_id 
     ON ensembl_gene_ids (ensembl_id ASC)
     ''', '''
@@ -1034,8 +1048,8 @@ SQL_INDICES = [
     CREATE INDEX IF NOT EXISTS idx_lookup_ensembl_gene_id 
     ON ensembl_genes_lookup (ensembl_gene_id ASC)
     ''', '''
-    CREATE INDEX IF NOT EXISTS idx_lookup_value 
-    ON ensembl_genes_lookup (lookup_value ASC)
+    CREATE INDEX IF NOT EXISTS idx_lookup_value_ranking_id
+    ON ensembl_genes_lookup (lookup_value ASC, ranking_id ASC)
     ''', '''
     CREATE INDEX IF NOT EXISTS idx_lookup_id 
     ON ensembl_genes_lookup (ranking_id ASC)
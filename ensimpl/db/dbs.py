@@ -1,15 +1,267 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 from typing import Dict
+from typing import List
 from typing import Optional
 from typing import Tuple
-import glob
+import atexit
+import functools
+import json
 import os
+import re
+import sqlite3
+import threading
+import urllib.request
+import weakref
 
-import natsort
+ENSIMPL_DB_NAME = 'ensimpl.*.db3'
+ENSIMPL_DB_PREFIX, ENSIMPL_DB_SUFFIX = ENSIMPL_DB_NAME.split('*')
+ENSIMPL_META_CACHE = '.ensimpl_meta_cache.json'
 
-from ensimpl.utils import multikeysort
-from ensimpl.db import meta
+# ensimpl.<release>.<species>.db3
+_DB_RE = re.compile(r'ensimpl\.(\d+)\.([^.]+)\.db3$')
 
-ENSIMPL_DB_NAME = 'ensimpl.*.db3'
+# applied to every new connection, the databases are read only so the
+# journal mode and synchronous settings are left alone
+SQLITE_PRAGMAS = [
+    'PRAGMA query_only = 1',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -65536',
+    'PRAGMA busy_timeout = 5000',
+]
+
+# (name, number of arguments, class) of the aggregates created on every
+# connection, see register_aggregate
+SQLITE_AGGREGATES = []
+
+
+class _ConnectionCache:
+    """The connections of one thread keyed by database path, each with the
+    inode of the file it was opened on."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.conns = {}
+
+
+class _LocalConnections(threading.local):
+    def __init__(self):
+        self.cache = _ConnectionCache()
+        _CONNECTION_CACHES.add(self.cache)
+
+
+_CONNECTION_CACHES = weakref.WeakSet()
+_CONNECTIONS = _LocalConnections()
+
+
+def get_connection(db: str) -> sqlite3.Connection:
+    """Get the connection to `db` for the current thread, opening and
+    tuning it on first use.  Connections are kept open for the life of the
+    thread so callers should close their cursors but not the connection.
+    A database that is replaced on disk is reopened.
+
+    Args:
+        db: The Ensimpl database.
+
+    Returns:
+        The connection, with ``row_factory`` set to :class:`sqlite3.Row`.
+
+    Raises:
+        FileNotFoundError: If `db` does not exist.
+    """
+    cache = _CONNECTIONS.cache
+
+    # connections must not be shared with a forked child
+    if cache.pid != os.getpid():
+        cache.pid = os.getpid()
+        cache.conns = {}
+
+    # prevent erroneously creating a database
+    if not os.path.isfile(db):
+        raise FileNotFoundError(db)
+
+    st_ino = os.stat(db).st_ino
+    st_ino_conn, conn = cache.conns.get(db, (None, None))
+
+    if conn is not None and st_ino_conn != st_ino:
+        # an open connection keeps reading the file it was opened on
+        conn.close()
+        conn = None
+
+    if conn is None:
+        # opened read only, and in autocommit mode so no implicit
+        # transaction is left open between calls
+        uri = f'file:{urllib.request.pathname2url(os.path.abspath(db))}?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               isolation_level=None)
+        conn.row_factory = sqlite3.Row
+
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+
+        for name, n_arg, aggregate_class in SQLITE_AGGREGATES:
+            conn.create_aggregate(name, n_arg, aggregate_class)
+
+        cache.conns[db] = (st_ino, conn)
+
+    return conn
+
+
+@atexit.register
+def close_connections() -> None:
+    """Close every cached connection."""
+    for cache in list(_CONNECTION_CACHES):
+        if cache.pid != os.getpid():
+            continue
+
+        for _, conn in cache.conns.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+        cache.conns = {}
+
+
+def register_aggregate(name: str, n_arg: int, aggregate_class: type) -> None:
+    """Create an SQL aggregate function on every connection, the ones
+    already open and the ones opened later.
+
+    Args:
+        name: The name of the SQL function.
+        n_arg: The number of arguments it takes.
+        aggregate_class: The class implementing ``step`` and ``finalize``.
+    """
+    SQLITE_AGGREGATES.append((name, n_arg, aggregate_class))
+
+    for cache in list(_CONNECTION_CACHES):
+        if cache.pid != os.getpid():
+            continue
+
+        for _, conn in cache.conns.values():
+            conn.create_aggregate(name, n_arg, aggregate_class)
+
+
+def cached_per_db(maxsize: int = 32) -> Callable:
+    """Memoize ``func(db, *args)`` per database file.  The cache is keyed by
+    path, inode and mtime so a database that is replaced or rewritten on
+    disk is read again, :func:`get_connection` reopens a replaced database.
+
+    The cached value is shared between callers and must not be modified.
+
+    Args:
+        maxsize: The number of entries to keep.
+
+    Returns:
+        A decorator for functions taking the Ensimpl database as their first
+        argument, and any other arguments positionally.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.lru_cache(maxsize=maxsize)
+        def cached(db: str, st_ino: int, st_mtime_ns: int, *args):
+            return func(db, *args)
+
+        @functools.wraps(func)
+        def wrapper(db: str, *args):
+            st = os.stat(db)
+            return cached(db, st.st_ino, st.st_mtime_ns, *args)
+
+        wrapper.cache_clear = cached.cache_clear
+
+        return wrapper
+
+    return decorator
+
+
+def _load_meta_cache(cache_file: str) -> Dict:
+    """Load the meta information sidecar file.
+
+    Args:
+        cache_file: The path to the sidecar file.
+
+    Returns:
+        A dict keyed by database file name, empty if the file is missing or
+        unreadable.
+    """
+    try:
+        with open(cache_file) as fd:
+            cache = json.load(fd)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta_cache(cache_file: str, cache: Dict) -> None:
+    """Atomically write the meta information sidecar file.  Failures are
+    ignored since the ensimpl directory is commonly mounted read-only.
+
+    Args:
+        cache_file: The path to the sidecar file.
+        cache: The cache to write.
+    """
+    tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+
+    try:
+        with open(tmp_file, 'w') as fd:
+            json.dump(cache, fd, indent=1, sort_keys=True)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def get_all_db_meta(directory: str, databases: List[str]) -> List[Dict]:
+    """Get the meta information for every database in `databases`.
+
+    Cached values from the sidecar file in `directory` are used for files
+    whose inode and mtime are unchanged, the rest are read in parallel.
+
+    Args:
+        directory: The directory path.
+        databases: A list of database file paths in `directory`.
+
+    Returns:
+        A list of meta information dicts, in the same order as `databases`.
+    """
+    # imported here as meta memoizes with this module at import time
+    from ensimpl.db import meta
+
+    cache_file = os.path.join(directory, ENSIMPL_META_CACHE)
+    cache = _load_meta_cache(cache_file)
+
+    new_cache = {}
+    stale = []
+
+    for db in databases:
+        st = os.stat(db)
+        name = os.path.basename(db)
+        cached = cache.get(name)
+
+        if cached and cached.get('st_ino') == st.st_ino and \
+                cached.get('st_mtime_ns') == st.st_mtime_ns:
+            new_cache[name] = cached
+        else:
+            stale.append((db, name, st))
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(32, len(stale))) as executor:
+            results = executor.map(lambda s: meta.db_meta(s[0]), stale)
+
+            for (db, name, st), meta_info in zip(stale, results):
+                new_cache[name] = {
+                    'st_ino': st.st_ino,
+                    'st_mtime_ns': st.st_mtime_ns,
+                    'meta': meta_info
+                }
+
+    if new_cache != cache:
+        _save_meta_cache(cache_file, new_cache)
+
+    return [new_cache[os.path.basename(db)]['meta'] for db in databases]
 
 
 def get_all_ensimpl_dbs(directory: str) -> Tuple:
@@ -19,13 +271,19 @@ def get_all_ensimpl_dbs(directory: str) -> Tuple:
     Args:
         directory (str): The directory path.
     """
-    databases = glob.glob(os.path.join(directory, ENSIMPL_DB_NAME))
+    with os.scandir(directory) as entries:
+        databases = [entry.path for entry in entries
+                     if entry.name.startswith(ENSIMPL_DB_PREFIX) and
+                     entry.name.endswith(ENSIMPL_DB_SUFFIX) and
+                     entry.is_file()]
 
     max_assembly = {}
-    temp_list = []
+    assembly_dbs = defaultdict(list)
+    db_list = []
+    db_dict = {}
 
-    for db in databases:
-        meta_info = meta.db_meta(db)
+    for db, meta_info in zip(databases,
+                             get_all_db_meta(directory, databases)):
         assembly = meta_info['assembly']
         release = meta_info['release']
         species = meta_info['species']
@@ -43,30 +301,27 @@ def get_all_ensimpl_dbs(directory: str) -> Tuple:
             'greedy_release': None
         }
 
+        db_list.append(val)
+        assembly_dbs[combined_key].append(val)
+
+        # combined key will be 'release:species'
+        db_dict[f'{release}:{species}'] = val
+
         release = int(release)
 
         max_assembly[combined_key] = max(max_assembly.get(combined_key, release),
                                          release)
 
-        temp_list.append(val)
-
-    db_list = []
-    db_dict = {}
-
-    for db in temp_list:
-        combined_key_assembly = f'{db["assembly"]}:{db["species"]}'
-        db['greedy_release'] = max_assembly[combined_key_assembly]
-        db_list.append(db)
-
-        # combined key will be 'release:species'
-        combined_key = f'{db["release"]}:{db["species"]}'
-        db_dict[combined_key] = db
+    # every database of an assembly shares the latest release of it
+    for combined_key, assembly_list in assembly_dbs.items():
+        for val in assembly_list:
+            val['greedy_release'] = max_assembly[combined_key]
 
     # sort the databases in descending order by version and then species for
     # readability in the API
-    all_sorted_dbs = \
-        natsort.natsorted(db_list, key=lambda e: (e['release'], e['species']))
-    all_sorted_dbs = list(reversed(all_sorted_dbs))
+    all_sorted_dbs = sorted(db_list,
+                            key=lambda e: (int(e['release']), e['species']),
+                            reverse=True)
 
     return all_sorted_dbs, db_dict
 
@@ -125,17 +380,20 @@ def get_database(release: str, species: str, dbs: dict,
     Returns:
         The sqlite database.
     """
-    try:
-        if greedy:
-            release = dbs[f'{release}:{species}']['greedy_release']
+    entry = dbs.get(f'{release}:{species}')
 
-        return dbs[f'{release}:{species}']['db']
-    except Exception:
+    if entry is not None and greedy:
+        release = entry['greedy_release']
+        entry = dbs.get(f'{release}:{species}')
+
+    if entry is None:
         ensimpl_dir = os.environ.get('ENSIMPL_DIR', None)
         raise Exception(f'Unable to find database: '
                         f'release {release}, species {species}, '
                         f'ENSIMPL_DIR {ensimpl_dir}')
 
+    return entry['db']
+
 
 def get_release_species(db: str) -> Dict[str, str]:
     """
@@ -146,12 +404,9 @@ def get_release_species(db: str) -> Dict[str, str]:
     Returns:
         A dict with elements release and species.
     """
-    try:
-        val = {
-            'release': db.split('.')[1],
-            'species': db.split('.')[2]
-        }
+    match = _DB_RE.search(os.path.basename(db))
 
-        return val
-    except Exception:
+    if not match:
         raise Exception(f'Unable to determine release and species from {db}')
+
+    return {'release': match.group(1), 'species': match.group(2)}
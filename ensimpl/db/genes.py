@@ -1,7 +1,9 @@
 # standard library imports
-import os
+import json
+import random
 import sqlite3
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # third party imports
 from typing import Dict
@@ -37,10 +39,17 @@ SELECT g.ensembl_id match_id,
        g.chromosome gene_chromosome,
        g.start_position gene_start,
        g.end_position gene_end,
-       g.strand gene_strand,
+       CASE WHEN g.strand > 0 THEN '+' ELSE '-' END gene_strand,
        g.homolog_ids homolog_ids,
-       'EG' type_key
+       'EG' type_key,
+       null transcript_id,
+       null ensembl_id_version,
+       null ensembl_symbol,
+       null start,
+       null end,
+       null exon_number
   FROM ensembl_genes g
+  LEFT JOIN chromosomes c ON c.chromosome = g.chromosome
 '''
 
 SQL_GENES_FILTERED = '''
@@ -56,19 +65,27 @@ SELECT t.ensembl_id match_id,
        g.chromosome gene_chromosome,
        g.start_position gene_start,
        g.end_position gene_end,
-       g.strand gene_strand,
+       CASE WHEN g.strand > 0 THEN '+' ELSE '-' END gene_strand,
        g.homolog_ids homolog_ids,
-       'EG' type_key
-  FROM ensembl_genes g,
+       'EG' type_key,
+       null transcript_id,
+       null ensembl_id_version,
+       null ensembl_symbol,
+       null start,
+       null end,
+       null exon_number
+  FROM ensembl_genes g
+  LEFT JOIN chromosomes c ON c.chromosome = g.chromosome,
        (SELECT eg.gene_id, eg.ensembl_id 
           FROM ensembl_gtpe eg
-         WHERE eg.ensembl_id in (SELECT ensembl_id 
-                                   FROM {})) t       
+         WHERE eg.ensembl_id in (SELECT value 
+                                   FROM json_each(:ids))) t       
  WHERE g.ensembl_id = t.gene_id
 '''
 
 SQL_GENES_FULL_ALL = '''
 SELECT g.ensembl_id match_id,
+       r.ensembl_id ensembl_id,
        g.ensembl_id gene_id,
        g.ensembl_version gene_version,
        g.species_id gene_species_id,
@@ -79,16 +96,24 @@ SELECT g.ensembl_id match_id,
        g.chromosome gene_chromosome,
        g.start_position gene_start,
        g.end_position gene_end,
-       g.strand gene_strand,
+       CASE WHEN g.strand > 0 THEN '+' ELSE '-' END gene_strand,
        g.homolog_ids homolog_ids,
-       r.*
-  FROM ensembl_genes g,
+       r.type_key type_key,
+       r.transcript_id transcript_id,
+       r.ensembl_id_version ensembl_id_version,
+       r.ensembl_symbol ensembl_symbol,
+       r.start start,
+       r.end end,
+       r.exon_number exon_number
+  FROM ensembl_genes g
+  LEFT JOIN chromosomes c ON c.chromosome = g.chromosome,
        ensembl_gtpe r
  WHERE g.ensembl_id = r.gene_id
 '''
 
 SQL_GENES_FULL_FILTERED = '''
 SELECT t.ensembl_id match_id,
+       r.ensembl_id ensembl_id,
        g.ensembl_id gene_id,
        g.ensembl_version gene_version,
        g.species_id gene_species_id,
@@ -99,26 +124,43 @@ SELECT t.ensembl_id match_id,
        g.chromosome gene_chromosome,
        g.start_position gene_start,
        g.end_position gene_end,
-       g.strand gene_strand,
+       CASE WHEN g.strand > 0 THEN '+' ELSE '-' END gene_strand,
        g.homolog_ids homolog_ids,
-       r.*
-  FROM ensembl_genes g,
+       r.type_key type_key,
+       r.transcript_id transcript_id,
+       r.ensembl_id_version ensembl_id_version,
+       r.ensembl_symbol ensembl_symbol,
+       r.start start,
+       r.end end,
+       r.exon_number exon_number
+  FROM ensembl_genes g
+  LEFT JOIN chromosomes c ON c.chromosome = g.chromosome,
        ensembl_gtpe r,       
        (SELECT eg.gene_id, eg.ensembl_id 
           FROM ensembl_gtpe eg
-         WHERE eg.ensembl_id in (SELECT ensembl_id 
-                                   FROM {})) t       
+         WHERE eg.ensembl_id in (SELECT value 
+                                   FROM json_each(:ids))) t       
  WHERE g.ensembl_id = r.gene_id
    AND r.gene_id = t.gene_id  
 '''
 
 
-SQL_GENES_ORDER_BY_ID = ' ORDER BY g.ensembl_id'
+# column positions in the SQL_GENES_* queries
+(COL_MATCH_ID, COL_ENSEMBL_ID, COL_GENE_ID, COL_GENE_VERSION,
+ COL_GENE_SPECIES_ID, COL_GENE_SYMBOL, COL_GENE_NAME, COL_GENE_SYNONYMS,
+ COL_GENE_EXTERNAL_IDS, COL_GENE_CHROMOSOME, COL_GENE_START, COL_GENE_END,
+ COL_GENE_STRAND, COL_HOMOLOG_IDS, COL_TYPE_KEY, COL_TRANSCRIPT_ID,
+ COL_VERSION, COL_SYMBOL, COL_START, COL_END, COL_EXON_NUMBER) = range(21)
+
+# rows fetched per call when streaming large results
+FETCH_SIZE = 1000
+
+# both orders end in match_id so that the rows for one match are contiguous
+SQL_GENES_ORDER_BY_ID = ' ORDER BY g.ensembl_id, match_id'
 
 SQL_GENES_ORDER_BY_POSITION = '''
- ORDER BY cast(
-       replace(replace(replace(g.chromosome,'X','50'),'Y','51'),'MT','51') 
-       AS int), g.start_position, g.end_position
+ ORDER BY c.chromosome_num, g.start_position, g.end_position, g.ensembl_id,
+       match_id
 '''
 
 SQL_HOMOLOGY = '''
@@ -154,98 +196,130 @@ SELECT eh.ensembl_id,
        eh.wga_coverage,
        eh.is_high_confidence conf
   FROM ensembl_homologs eh
- WHERE eh.ensembl_id in ({})
+ WHERE eh.ensembl_id in (SELECT value FROM json_each(:ids))
  ORDER BY eh.ensembl_id, eh.homolog_id
 '''
 
+# the homologs are in both ensembl_gene_ids, as 'Ensembl_homolog', and in
+# ensembl_homologs, UNION removes the duplicates
 SQL_IDS_FILTERED = '''
-SELECT all_ids.ensembl_id,
-       all_ids.external_id,
-       all_ids.external_db,
-       matches.match_id
-  FROM (SELECT ensembl_id, external_id, external_db
-          FROM ensembl_gene_ids        
-         UNION        
-        SELECT ensembl_id, homolog_id external_id, 'Ensembl_homolog' external_db
-          FROM ensembl_homologs
-       ) all_ids,
-       (SELECT distinct ensembl_id, external_id match_id
-          FROM ensembl_gene_ids
-         WHERE external_id in ({})
-           AND external_db = "{}"
-       ) matches
- WHERE matches.ensembl_id = all_ids.ensembl_id       
- ORDER BY all_ids.ensembl_id, all_ids.external_db, all_ids.external_id
+WITH matches AS (
+       SELECT distinct ensembl_id, external_id match_id
+         FROM ensembl_gene_ids
+        WHERE external_id in (SELECT value FROM json_each(:ids))
+          AND external_db = :source_db
+     )
+SELECT i.ensembl_id ensembl_id,
+       i.external_id external_id,
+       i.external_db external_db,
+       m.match_id match_id
+  FROM matches m,
+       ensembl_gene_ids i
+ WHERE i.ensembl_id = m.ensembl_id
+ UNION
+SELECT h.ensembl_id, h.homolog_id, 'Ensembl_homolog', m.match_id
+  FROM matches m,
+       ensembl_homologs h
+ WHERE h.ensembl_id = m.ensembl_id
+ ORDER BY ensembl_id, external_db, external_id
 '''
 
 SQL_IDS_FILTERED_ENSEMBL = '''
-SELECT all_ids.ensembl_id,
-       all_ids.external_id,
-       all_ids.external_db,
-       matches.match_id
-  FROM (SELECT ensembl_id, external_id, external_db
-          FROM ensembl_gene_ids        
-         UNION        
-        SELECT ensembl_id, homolog_id external_id, 'Ensembl_homolog' external_db
-          FROM ensembl_homologs
-       ) all_ids,
-       (SELECT distinct ensembl_id, ensembl_id match_id
-          FROM ensembl_gene_ids
-         WHERE ensembl_id in ({})
-       ) matches
- WHERE matches.ensembl_id = all_ids.ensembl_id       
- ORDER BY all_ids.ensembl_id, all_ids.external_db, all_ids.external_id
+WITH matches AS (
+       SELECT distinct ensembl_id, ensembl_id match_id
+         FROM ensembl_gene_ids
+        WHERE ensembl_id in (SELECT value FROM json_each(:ids))
+     )
+SELECT i.ensembl_id ensembl_id,
+       i.external_id external_id,
+       i.external_db external_db,
+       m.match_id match_id
+  FROM matches m,
+       ensembl_gene_ids i
+ WHERE i.ensembl_id = m.ensembl_id
+ UNION
+SELECT h.ensembl_id, h.homolog_id, 'Ensembl_homolog', m.match_id
+  FROM matches m,
+       ensembl_homologs h
+ WHERE h.ensembl_id = m.ensembl_id
+ ORDER BY ensembl_id, external_db, external_id
 '''
 
 SQL_IDS_ALL = '''
-SELECT all_ids.ensembl_id,
-       all_ids.external_id,
-       all_ids.external_db,
-       matches.match_id
-  FROM (SELECT ensembl_id, external_id, external_db
-          FROM ensembl_gene_ids        
-         UNION        
-        SELECT ensembl_id, homolog_id external_id, 'Ensembl_homolog' external_db
-          FROM ensembl_homologs
-       ) all_ids,
-       (SELECT distinct ensembl_id, ensembl_id match_id
-          FROM ensembl_gene_ids
-       ) matches
- WHERE matches.ensembl_id = all_ids.ensembl_id       
- ORDER BY all_ids.ensembl_id, all_ids.external_db, all_ids.external_id
+SELECT ensembl_id,
+       external_id,
+       external_db,
+       ensembl_id match_id
+  FROM ensembl_gene_ids
+ UNION
+SELECT ensembl_id, homolog_id, 'Ensembl_homolog', ensembl_id
+  FROM ensembl_homologs
+ WHERE ensembl_id in (SELECT ensembl_id FROM ensembl_gene_ids)
+ ORDER BY ensembl_id, external_db, external_id
 '''
 
-SQL_IDS_RANDOM = '''
-SELECT r.*
-  FROM (SELECT external_id random_id, external_db source_db
-          FROM ensembl_gene_ids 
-         UNION
-        SELECT ensembl_id, 'Ensembl' 
-          FROM ensembl_genes 
-        ) r
-WHERE r.source_db = :source_db       
-ORDER BY RANDOM() 
-LIMIT :limit
+SQL_IDS_SOURCE = '''
+SELECT external_id random_id
+  FROM ensembl_gene_ids
+ WHERE external_db = :source_db
+ UNION
+SELECT ensembl_id
+  FROM ensembl_genes
+ WHERE :source_db = 'Ensembl'
 '''
 
+# exon_rle is the _ExonRle aggregate, registered on every connection
 SQL_EXON_INFO = '''
-    SELECT gtpe.* 
-      FROM ensembl_genes g,
-           ensembl_gtpe gtpe,
-           chromosomes c
-     WHERE g.ensembl_id = gtpe.gene_id 
-       AND gtpe.seqid = c.chromosome
-       AND gtpe.type_key not in ('ET', 'EP')
+    SELECT gtpe.ensembl_id,
+           gtpe.ensembl_symbol,
+           gtpe.seqid,
+           gtpe.start,
+           gtpe.end,
+           gtpe.strand,
+           exon_rle(gtpe.start, e.start, e.end) exons
+      FROM ensembl_genes g
+      JOIN ensembl_gtpe gtpe ON gtpe.gene_id = g.ensembl_id
+      JOIN chromosomes c ON c.chromosome = gtpe.seqid
+      LEFT JOIN ensembl_gtpe e ON e.gene_id = gtpe.gene_id
+                              AND e.seqid = gtpe.seqid
+                              AND e.type_key = 'EE'
+     WHERE gtpe.type_key = 'EG'
 '''
 
 SQL_EXON_INFO_ORDER_BY = '''
+     GROUP BY gtpe.ensembl_id
      ORDER BY c.chromosome_num, 
            g.start_position, 
-           gtpe.gene_id, 
-           ifnull(gtpe.exon_number, 0)
+           gtpe.gene_id
 '''
 
 
+def _external_ids(value: str) -> List[Dict]:
+    """Parse an encoded ``db/db_id||db/db_id`` external ids column.
+
+    Args:
+        value: The column value.
+
+    Returns:
+        A list of dicts with keys 'db' and 'db_id'.
+    """
+    return [{'db': elem[0], 'db_id': elem[1]}
+            for elem in (e.split('/') for e in value.split('||'))]
+
+
+def _homolog_ids(value: str) -> List[Dict]:
+    """Parse an encoded ``id/symbol||id/symbol`` homolog ids column.
+
+    Args:
+        value: The column value.
+
+    Returns:
+        A list of dicts with keys 'id' and 'symbol'.
+    """
+    return [{'id': elem[0], 'symbol': elem[1]}
+            for elem in (e.split('/') for e in value.split('||'))]
+
+
 def get_ids(db: str, ids: Optional[List[str]] = None,
             source_db: Optional[str] = 'Ensembl') -> Dict:
     """Get all ids for identifiers.
@@ -263,23 +337,13 @@ def get_ids(db: str, ids: Optional[List[str]] = None,
     """
     results = OrderedDict()
 
-    valid_db_ids = ['Ensembl', 'Ensembl_homolog']
-
-    external_dbs = meta.external_dbs(db)
-
-    for ext_db in external_dbs:
-        valid_db_ids.append(ext_db['external_db_id'])
+    valid_db_ids = meta.source_dbs(db)
 
     if source_db not in valid_db_ids:
         raise ValueError(f'Valid source dbs are: {",".join(valid_db_ids)}')
 
     try:
-        # prevent erroneously creating a database
-        if not os.path.isfile(db):
-            raise FileNotFoundError(db)
-
-        conn = sqlite3.connect(db)
-        conn.row_factory = sqlite3.Row
+        conn = dbs.get_connection(db)
         cursor = conn.cursor()
 
         #
@@ -287,38 +351,48 @@ def get_ids(db: str, ids: Optional[List[str]] = None,
         #
 
         sql_query = SQL_IDS_ALL
+        params = {}
 
         if ids:
-            in_values = '","'.join(ids)
-            in_values = f'"{in_values}"'
+            # the ids are bound as a single JSON array
+            params = {'ids': json.dumps(ids), 'source_db': source_db}
 
             if source_db and source_db.lower() == 'ensembl':
                 sql_query = SQL_IDS_FILTERED_ENSEMBL
-                sql_query = sql_query.format(in_values)
             else:
                 sql_query = SQL_IDS_FILTERED
-                sql_query = sql_query.format(in_values, source_db)
 
         #
         # execute the query
         #
 
-        for row in cursor.execute(sql_query, {}):
+        cursor.row_factory = None
+        cursor.arraysize = FETCH_SIZE
+        cursor.execute(sql_query, params)
 
-            match_id = row['match_id']
+        current_id = None
+        match = None
 
-            match = results.get(match_id,
-                                {'Ensembl': [row['ensembl_id']]})
+        # rows of a match mostly arrive together, so the match is only
+        # looked up when it changes
+        for rows in iter(cursor.fetchmany, []):
+            for ensembl_id, external_id, external_db, match_id in rows:
+                if match_id != current_id:
+                    current_id = match_id
+                    match = results.get(match_id)
 
-            id_arr = match.get(row['external_db'], [])
-            id_arr.append(row['external_id'])
+                    if match is None:
+                        match = {'Ensembl': [ensembl_id]}
+                        results[match_id] = match
 
-            match[row['external_db']] = id_arr
+                id_arr = match.get(external_db)
 
-            results[match_id] = match
+                if id_arr is None:
+                    match[external_db] = [external_id]
+                else:
+                    id_arr.append(external_id)
 
         cursor.close()
-        conn.close()
 
     except sqlite3.Error as e:
         raise Exception(e)
@@ -326,69 +400,68 @@ def get_ids(db: str, ids: Optional[List[str]] = None,
     return results
 
 
-def get_homology(db: str, ids: Optional[List[str]] = None) -> Dict:
-    """Get homology information.
+def _homology(conn: sqlite3.Connection,
+              ids_json: Optional[str] = None) -> Dict:
+    """Run the homology query on an open connection.
 
     Args:
-        db: The Ensimpl database.
-        ids: A list of Ensembl identifiers.
+        conn: The connection to the Ensimpl database.
+        ids_json: The Ensembl identifiers as a JSON array, None for all.
 
     Returns:
         A dict of homology information.
-
-    Raises:
-        Exception: When sqlite error or other error occurs.
     """
-    results = OrderedDict()
-
-    try:
-        # prevent erroneously creating a database
-        if not os.path.isfile(db):
-            raise FileNotFoundError(db)
+    matches = []
+    current_id = None
+    gene = None
 
-        conn = sqlite3.connect(db)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        #
-        # build the query
-        #
-
-        sql_query = SQL_HOMOLOGY
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.arraysize = FETCH_SIZE
 
-        if ids:
-            sql_query = SQL_HOMOLOGY_FILTERED
+    if ids_json:
+        cursor.execute(SQL_HOMOLOGY_FILTERED, {'ids': ids_json})
+    else:
+        cursor.execute(SQL_HOMOLOGY)
 
-            in_values = '","'.join(ids)
-            in_values = f'"{in_values}"'
+    # the column names are read once per query rather than once per row
+    keys = [col[0] for col in cursor.description]
 
-            # create a temp table and insert into
-            sql_query = sql_query.format(in_values)
+    # rows are ordered by ensembl_id, so each gene is built in one go
+    for rows in iter(cursor.fetchmany, []):
+        for row in rows:
+            if row[0] != current_id:
+                current_id = row[0]
+                gene = []
+                matches.append((current_id, gene))
 
-        #
-        # execute the query
-        #
+            gene.append(dict(zip(keys, row)))
 
-        for row in cursor.execute(sql_query, {}):
-            gene_id = row['ensembl_id']
+    cursor.close()
 
-            gene = results.get(gene_id)
+    return OrderedDict(matches)
 
-            if not gene:
-                gene = []
 
-            gene.append(utils.dictify_row(cursor, row))
+def get_homology(db: str, ids: Optional[List[str]] = None) -> Dict:
+    """Get homology information.
 
-            results[gene_id] = gene
+    Args:
+        db: The Ensimpl database.
+        ids: A list of Ensembl identifiers.
 
-        cursor.close()
-        conn.close()
+    Returns:
+        A dict of homology information.
 
+    Raises:
+        Exception: When sqlite error or other error occurs.
+    """
+    try:
+        # the ids are bound as a single JSON array
+        return _homology(dbs.get_connection(db),
+                         json.dumps(ids) if ids else None)
     except sqlite3.Error as e:
         raise Exception(e)
 
-    return results
-
 
 def get(db: str, ids: Optional[List[str]] = None, order: Optional[str] = 'id',
         details: Optional[bool] = False) -> Dict:
@@ -447,14 +520,16 @@ def get(db: str, ids: Optional[List[str]] = None, order: Optional[str] = 'id',
         Exception: When sqlite error or other error occurs.
     """
     results = OrderedDict()
+    conn = None
 
     try:
-        # prevent erroneously creating a database
-        if not os.path.isfile(db):
-            raise FileNotFoundError(db)
+        conn = dbs.get_connection(db)
+
+        # gene rows and homologs are read from one snapshot with a single
+        # lock rather than one per statement
+        if details:
+            conn.execute('BEGIN')
 
-        conn = sqlite3.connect(db)
-        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
 
         #
@@ -462,6 +537,7 @@ def get(db: str, ids: Optional[List[str]] = None, order: Optional[str] = 'id',
         #
 
         sql_query = None
+        params = {}
 
         if ids:
             if details:
@@ -469,21 +545,8 @@ def get(db: str, ids: Optional[List[str]] = None, order: Optional[str] = 'id',
             else:
                 sql_query = SQL_GENES_FILTERED
 
-            # create a temp table and insert into
-            temp_table = f'lookup_ids_{utils.create_random_string()}'
-
-            sql_temp = (f'CREATE TEMPORARY TABLE {temp_table} ( '
-                        'ensembl_id TEXT, '
-                        'PRIMARY KEY (ensembl_id) );')
-
-            cursor.execute(sql_temp)
-
-            sql_temp = f'INSERT INTO {temp_table} VALUES (?);'
-            _ids = [(_,) for _ in ids]
-            cursor.executemany(sql_temp, _ids)
-
-            # make sure we add the temp table name to the query
-            sql_query = sql_query.format(temp_table)
+            # the ids are bound as a single JSON array
+            params = {'ids': json.dumps(ids)}
         else:
             if details:
                 sql_query = SQL_GENES_FULL_ALL
@@ -500,149 +563,161 @@ def get(db: str, ids: Optional[List[str]] = None, order: Optional[str] = 'id',
         # execute the query
         #
 
-        for row in cursor.execute(sql_query, {}):
-            gene_id = row['gene_id']
-            ensembl_id = row['ensembl_id']
-            match_id = row['match_id']
+        # plain tuples, columns are read by position
+        cursor.row_factory = None
+        cursor.arraysize = FETCH_SIZE
+        cursor.execute(sql_query, params)
 
-            gene = results.get(match_id)
+        current_id = None
+        gene = None
 
-            if not gene:
-                gene = {'id': gene_id, 'transcripts': {}}
+        # the order by keeps the rows of a match together, so the current
+        # gene is only looked up when the match changes, an id shared by
+        # several genes can still come back to an earlier match
+        for rows in iter(cursor.fetchmany, []):
+            for row in rows:
+                ensembl_id = row[COL_ENSEMBL_ID]
+                match_id = row[COL_MATCH_ID]
 
-            if row['type_key'] == 'EG':
-                gene['species_id'] = row['gene_species_id']
-                gene['chromosome'] = row['gene_chromosome']
-                gene['start'] = row['gene_start']
-                gene['end'] = row['gene_end']
-                gene['strand'] = '+' if row['gene_strand'] > 0 else '-'
+                if match_id != current_id:
+                    current_id = match_id
+                    gene = results.get(match_id)
 
-                if row['gene_version']:
-                    gene['ensembl_version'] = row['gene_version']
+                    if gene is None:
+                        # only the detail queries return transcript rows
+                        if details:
+                            gene = {'id': row[COL_GENE_ID], 'transcripts': {}}
+                        else:
+                            gene = {'id': row[COL_GENE_ID]}
+                        results[match_id] = gene
 
-                if row['gene_symbol']:
-                    gene['symbol'] = row['gene_symbol']
+                if row[COL_TYPE_KEY] == 'EG':
+                    gene['species_id'] = row[COL_GENE_SPECIES_ID]
+                    gene['chromosome'] = row[COL_GENE_CHROMOSOME]
+                    gene['start'] = row[COL_GENE_START]
+                    gene['end'] = row[COL_GENE_END]
+                    gene['strand'] = row[COL_GENE_STRAND]
 
-                if row['gene_name']:
-                    gene['name'] = row['gene_name']
+                    if row[COL_GENE_VERSION]:
+                        gene['ensembl_version'] = row[COL_GENE_VERSION]
 
-                if row['gene_synonyms']:
-                    row_synonyms = row['gene_synonyms']
-                    gene['synonyms'] = row_synonyms.split('||')
+                    if row[COL_GENE_SYMBOL]:
+                        gene['symbol'] = row[COL_GENE_SYMBOL]
 
-                if row['gene_external_ids']:
-                    row_external_ids = row['gene_external_ids']
-                    external_ids = []
-                    if row_external_ids:
-                        tmp_external_ids = row_external_ids.split('||')
-                        for e in tmp_external_ids:
-                            elem = e.split('/')
-                            external_ids.append({'db': elem[0], 'db_id': elem[1]})
-                    gene['external_ids'] = external_ids
+                    if row[COL_GENE_NAME]:
+                        gene['name'] = row[COL_GENE_NAME]
 
-                if row['homolog_ids']:
-                    row_homolog_ids = row['homolog_ids']
-                    homolog_ids = []
-                    if row_homolog_ids:
-                        tmp_homolog_ids = row_homolog_ids.split('||')
-                        for e in tmp_homolog_ids:
-                            elem = e.split('/')
-                            homolog_ids.append({'id': elem[0],
-                                                'symbol': elem[1]})
-                    gene['homolog_ids'] = homolog_ids
+                    if row[COL_GENE_SYNONYMS]:
+                        gene['synonyms'] = row[COL_GENE_SYNONYMS].split('||')
 
-            elif row['type_key'] == 'ET':
-                transcript_id = row['transcript_id']
-                transcript = {'id': transcript_id, 'exons': {}}
+                    if row[COL_GENE_EXTERNAL_IDS]:
+                        gene['external_ids'] = _external_ids(
+                            row[COL_GENE_EXTERNAL_IDS])
 
-                if row['ensembl_id_version']:
-                    transcript['version'] = row['ensembl_id_version']
+                    if row[COL_HOMOLOG_IDS]:
+                        gene['homolog_ids'] = _homolog_ids(
+                            row[COL_HOMOLOG_IDS])
 
-                if row['ensembl_symbol']:
-                    transcript['symbol'] = row['ensembl_symbol']
+                elif row[COL_TYPE_KEY] == 'ET':
+                    transcript_id = row[COL_TRANSCRIPT_ID]
+                    transcript = {'id': transcript_id, 'exons': {}}
 
-                transcript['start'] = row['start']
-                transcript['end'] = row['end']
+                    if row[COL_VERSION]:
+                        transcript['version'] = row[COL_VERSION]
 
-                gene['transcripts'][transcript_id] = transcript
+                    if row[COL_SYMBOL]:
+                        transcript['symbol'] = row[COL_SYMBOL]
 
-            elif row['type_key'] == 'EE':
-                transcript_id = row['transcript_id']
-                transcript = gene['transcripts'].get(transcript_id,
-                                                     {'id': transcript_id,
-                                                      'exons': {}})
+                    transcript['start'] = row[COL_START]
+                    transcript['end'] = row[COL_END]
 
-                exon = {'id': ensembl_id,
-                        'start': row['start'],
-                        'end': row['end'],
-                        'number': row['exon_number']}
+                    gene['transcripts'][transcript_id] = transcript
 
-                if row['ensembl_id_version']:
-                    exon['version'] = row['ensembl_id_version']
+                elif row[COL_TYPE_KEY] == 'EE':
+                    transcript_id = row[COL_TRANSCRIPT_ID]
+                    transcript = gene['transcripts'].get(transcript_id,
+                                                         {'id': transcript_id,
+                                                          'exons': {}})
 
-                transcript['exons'][ensembl_id] = exon
+                    exon = {'id': ensembl_id,
+                            'start': row[COL_START],
+                            'end': row[COL_END],
+                            'number': row[COL_EXON_NUMBER]}
 
-                gene['transcripts'][transcript_id] = transcript
+                    if row[COL_VERSION]:
+                        exon['version'] = row[COL_VERSION]
 
-            elif row['type_key'] == 'EP':
-                transcript_id = row['transcript_id']
-                transcript = gene['transcripts'].get(transcript_id,
-                                                     {'id': transcript_id,
-                                                      'exons': {}})
+                    transcript['exons'][ensembl_id] = exon
 
-                transcript['protein'] = {'id': ensembl_id,
-                                         'start': row['start'],
-                                         'end': row['end']}
+                    gene['transcripts'][transcript_id] = transcript
 
-                if row['ensembl_id_version']:
-                    transcript['protein']['version'] = row['ensembl_id_version']
+                elif row[COL_TYPE_KEY] == 'EP':
+                    transcript_id = row[COL_TRANSCRIPT_ID]
+                    transcript = gene['transcripts'].get(transcript_id,
+                                                         {'id': transcript_id,
+                                                          'exons': {}})
 
-                gene['transcripts'][transcript_id] = transcript
-            else:
-                LOG.error('Unknown')
+                    transcript['protein'] = {'id': ensembl_id,
+                                             'start': row[COL_START],
+                                             'end': row[COL_END]}
+
+                    if row[COL_VERSION]:
+                        transcript['protein']['version'] = row[COL_VERSION]
 
-            results[match_id] = gene
+                    gene['transcripts'][transcript_id] = transcript
+                else:
+                    LOG.error('Unknown')
 
         cursor.close()
 
         if details:
-            homologs = get_homology(db, ids)
+            # same connection, transaction and id binding as the genes
+            homologs = _homology(conn, params.get('ids'))
 
             # convert transcripts, etc to sorted list rather than dict
-            ret = OrderedDict()
             for (gene_id, gene) in results.items():
-                if gene:
-                    t = []
-                    for (transcript_id, transcript) in gene['transcripts'].items():
-                        e = []
-                        for (exon_id, exon) in transcript['exons'].items():
-                            e.append(exon)
-                        transcript['exons'] = sorted(e, key=lambda ex: ex['number'])
-                        t.append(transcript)
-                    gene['transcripts'] = sorted(t, key=lambda tr: tr['start'])
+                t = []
+                for transcript in gene['transcripts'].values():
+                    transcript['exons'] = sorted(
+                        transcript['exons'].values(),
+                        key=lambda ex: ex['number'])
+                    t.append(transcript)
+                gene['transcripts'] = sorted(t, key=lambda tr: tr['start'])
 
                 gene['homologs'] = homologs.get(gene_id, None)
 
-                ret[gene_id] = gene
-            results = ret
-        else:
-            ret = OrderedDict()
-            for (gene_id, gene) in results.items():
-                if gene:
-                    del gene['transcripts']
-                ret[gene_id] = gene
-
-            results = ret
-
-        cursor.close()
-        conn.close()
-
     except sqlite3.Error as e:
         raise Exception(e)
+    finally:
+        if conn is not None and conn.in_transaction:
+            conn.execute('COMMIT')
 
     return results
 
 
+@dbs.cached_per_db()
+def _source_ids(db: str, source_db: str) -> List[str]:
+    """Get every identifier of a source database.
+
+    Args:
+        db: The Ensimpl database.
+        source_db: source database identifier
+
+    Returns:
+        A list of identifiers (str), shared between callers.
+    """
+    conn = dbs.get_connection(db)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+
+    ids = [row[0] for row in cursor.execute(SQL_IDS_SOURCE,
+                                            {'source_db': source_db})]
+
+    cursor.close()
+
+    return ids
+
+
 def random_ids(db: str, source_db: Optional[str] = 'Ensembl',
                limit: Optional[int] = 10):
     """Get random ids.
@@ -656,37 +731,25 @@ def random_ids(db: str, source_db: Optional[str] = 'Ensembl',
         A list of Ensembl IDs (str)
 
     """
-    valid_db_ids = ['Ensembl', 'Ensembl_homolog']
-    external_dbs = meta.external_dbs(db)
-
-    for ext_db in external_dbs:
-        valid_db_ids.append(ext_db['external_db_id'])
+    valid_db_ids = meta.source_dbs(db)
 
     if source_db not in valid_db_ids:
         raise ValueError(f'Valid source dbs are: {",".join(valid_db_ids)}')
 
-    sql_statement = SQL_IDS_RANDOM
+    ids = _source_ids(db, source_db)
 
-    # prevent erroneously creating a database
-    if not os.path.isfile(db):
-        raise FileNotFoundError(db)
+    limit = int(limit)
 
-    conn = sqlite3.connect(db)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    if limit < 0 or limit > len(ids):
+        limit = len(ids)
 
-    params = {'source_db': source_db,
-              'limit': int(limit)}
+    return random.sample(ids, limit)
 
-    ids = []
 
-    for row in cursor.execute(sql_statement, params):
-        ids.append(row['random_id'])
-
-    cursor.close()
-    conn.close()
-
-    return ids
+# shared by every call so the worker threads, and the connections each one
+# keeps open, are reused
+_HISTORY_EXECUTOR = ThreadPoolExecutor(max_workers=8,
+                                       thread_name_prefix='ensimpl-history')
 
 
 def get_history(databases: List[str], ensembl_id: str,
@@ -708,15 +771,22 @@ def get_history(databases: List[str], ensembl_id: str,
     """
     results = {}
 
+    if not databases:
+        return results
+
+    # sqlite releases the GIL while stepping so the lookups run in parallel
+    futures = [_HISTORY_EXECUTOR.submit(get, database, [ensembl_id], details)
+               for database in databases]
+
     try:
-        for database in databases:
+        for database, future in zip(databases, futures):
             rs = dbs.get_release_species(database)
 
             try:
-                id_data = get(database, [ensembl_id], details)
+                id_data = future.result()
                 results[rs['release']] = id_data[ensembl_id]
             except KeyError as ke:
-                LOG.debug('value error', ke)
+                LOG.debug('value error: %s', ke)
 
     except ValueError as ve:
         LOG.debug(ve)
@@ -727,20 +797,35 @@ def get_history(databases: List[str], ensembl_id: str,
 
 
 def compute_union(exon_starts: List[int], exon_ends: List[int]) -> List:
-    edges = [(x, 1) for x in exon_starts] + [(x, -1) for x in exon_ends]
-    edges.sort(key=lambda pos: pos[0])
+    """Merge exons into the sorted, non-overlapping intervals covering them.
+    Exons that overlap or touch are merged into one interval.
 
+    Args:
+        exon_starts: The exon start positions.
+        exon_ends: The exon end positions, in the same order as the starts.
+
+    Returns:
+        A list of (start, end) tuples.
+    """
     intervals = []
-    height = 0
-    start = 0
 
-    for t in edges:
-        if height == 0:
-            start = t[0]
+    if not exon_starts:
+        return intervals
 
-        height += t[1]
-        if height == 0:
-            intervals.append((start, t[0]))
+    # one C level sort of the pairs and a single pass, rather than sorting
+    # start/end edges with a key function and tracking the overlap depth
+    exons = sorted(zip(exon_starts, exon_ends))
+    cur_start, cur_end = exons[0]
+
+    for start, end in exons:
+        if start > cur_end:
+            intervals.append((cur_start, cur_end))
+            cur_start = start
+            cur_end = end
+        elif end > cur_end:
+            cur_end = end
+
+    intervals.append((cur_start, cur_end))
 
     return intervals
 
@@ -763,10 +848,76 @@ def run_length_encode(reference: int, intervals: List[int]) -> List[int]:
     return deltas
 
 
+def exon_rle(reference: int, exon_starts: List[int],
+             exon_ends: List[int]) -> List[int]:
+    """Merge the exons and run length encode them in one pass, the same as
+    ``run_length_encode(reference, compute_union(exon_starts, exon_ends))``
+    without building the intermediate list of intervals.
+
+    Args:
+        reference: The position the first gap is measured from.
+        exon_starts: The exon start positions.
+        exon_ends: The exon end positions, in the same order as the starts.
+
+    Returns:
+        Alternating gap and exon lengths.
+    """
+    deltas = []
+
+    if not exon_starts:
+        return deltas
+
+    append = deltas.append
+    exons = sorted(zip(exon_starts, exon_ends))
+    cur_start, cur_end = exons[0]
+
+    for start, end in exons:
+        if start > cur_end:
+            append(cur_start - reference)
+            append(cur_end - cur_start)
+            reference = cur_end
+            cur_start = start
+            cur_end = end
+        elif end > cur_end:
+            cur_end = end
+
+    append(cur_start - reference)
+    append(cur_end - cur_start)
+
+    return deltas
+
+
 def split_exons(exon_string: str) -> List[int]:
     return [int(x) for x in exon_string.split(',') if x != '']
 
 
+class _ExonRle:
+    """SQLite aggregate returning the :func:`exon_rle` of a gene's exons as
+    a JSON array.  Exon rows that are NULL, from a LEFT JOIN of a gene
+    without exons, are ignored.
+    """
+
+    def __init__(self):
+        self.reference = None
+        self.exon_starts = []
+        self.exon_ends = []
+
+    def step(self, reference, start, end):
+        self.reference = reference
+
+        if start is not None:
+            self.exon_starts.append(int(start))
+            self.exon_ends.append(int(end))
+
+    def finalize(self):
+        deltas = exon_rle(int(self.reference), self.exon_starts,
+                          self.exon_ends)
+        return f'[{",".join(map(str, deltas))}]'
+
+
+dbs.register_aggregate('exon_rle', 3, _ExonRle)
+
+
 def get_exon_info(db: str, chrom: Optional[str] = None,
                   compress: Optional[bool] = False) -> List:
     """Get homology information.
@@ -782,83 +933,53 @@ def get_exon_info(db: str, chrom: Optional[str] = None,
     Raises:
         Exception: When sqlite error or other error occurs.
     """
-    # prevent erroneously creating a database
-    if not os.path.isfile(db):
-        raise FileNotFoundError(db)
-
-    conn = sqlite3.connect(db)
-    conn.row_factory = sqlite3.Row
+    conn = dbs.get_connection(db)
     cursor = conn.cursor()
 
+    params = {}
+
     if chrom is not None:
-        sql_where = f' AND gtpe.seqid = "{chrom}" '
+        sql_query = (f'{SQL_EXON_INFO} AND gtpe.seqid = :chrom '
+                     f'{SQL_EXON_INFO_ORDER_BY}')
+        params['chrom'] = chrom
     else:
-        sql_where = ''
-
-    sql_query = f'{SQL_EXON_INFO} {sql_where} {SQL_EXON_INFO_ORDER_BY}'
-
-    genes = {}
-
-    for row in cursor.execute(sql_query, {}):
-
-        tx_start = int(row['start'])
-        tx_end = int(row['end'])
+        sql_query = f'{SQL_EXON_INFO} {SQL_EXON_INFO_ORDER_BY}'
 
-        if row['type_key'] == 'EG':
+    cursor.row_factory = None
+    cursor.arraysize = FETCH_SIZE
+    cursor.execute(sql_query, params)
 
-            ensembl_id = row['ensembl_id']
-
-            genes[ensembl_id] = {
-                'id': ensembl_id,
-                'symbol': row['ensembl_symbol'],
-                'chr': row['seqid'],
-                'txStart': tx_start,
-                'txEnd': tx_end,
-                'strand': row['strand'],
-                'exonStarts': [],
-                'exonEnds': [],
-            }
-        else:
-            gene = genes[ensembl_id]
+    ret = []
 
-            gene['exonStarts'].append(tx_start)
-            gene['exonEnds'].append(tx_end)
+    # one row per gene with its exons already encoded by exon_rle, the
+    # compressed list has them without the brackets of the JSON array
+    for rows in iter(cursor.fetchmany, []):
+        for (ensembl_id, symbol, seqid, start, end, strand, exons) in rows:
+            tx_start = int(start)
+            tx_length = int(end) - tx_start
+
+            if compress:
+                ret.append([
+                    ensembl_id,
+                    symbol,
+                    seqid,
+                    tx_start,
+                    tx_length,
+                    strand,
+                    exons[1:-1]
+                ])
+            else:
+                ret.append({
+                    'id': ensembl_id,
+                    'symbol': symbol,
+                    'chr': seqid,
+                    'start': tx_start,
+                    'length': tx_length,
+                    'strand': strand,
+                    'exons': json.loads(exons)
+                })
 
     cursor.close()
-    conn.close()
-
-    ret = []
-
-    if compress:
-        for gene in genes.values():
-            exons = ','.join([str(x) for x in run_length_encode(
-                gene['txStart'],
-                compute_union(gene['exonStarts'], gene['exonEnds']))])
-
-            ret.append([
-                gene['id'],
-                gene['symbol'],
-                gene['chr'],
-                gene['txStart'],
-                gene['txEnd'] - gene['txStart'],
-                gene['strand'],
-                exons
-            ])
-    else:
-        for gene in genes.values():
-            exons = [x for x in run_length_encode(
-                gene['txStart'],
-                compute_union(gene['exonStarts'], gene['exonEnds']))]
-
-            ret.append({
-                'id': gene['id'],
-                'symbol': gene['symbol'],
-                'chr': gene['chr'],
-                'start': gene['txStart'],
-                'length': gene['txEnd'] - gene['txStart'],
-                'strand': gene['strand'],
-                'exons': exons
-            })
 
     return ret
 
@@ -1,7 +1,3 @@
-from collections import OrderedDict
-import os
-import sqlite3
-
 from typing import Dict
 from typing import List
 
@@ -10,7 +6,12 @@ from ensimpl.db import dbs
 
 LOG = utils.get_logger()
 
+# enough entries for every release and species to be loaded at startup by
+# warm
+_cached = dbs.cached_per_db(maxsize=256)
+
 
+@_cached
 def chromosomes(db: str) -> List:
     """Get the chromosomes.
 
@@ -23,12 +24,7 @@ def chromosomes(db: str) -> List:
     """
     sql_statement = 'SELECT * FROM chromosomes ORDER BY chromosome_num '
 
-    # prevent erroneously creating a database
-    if not os.path.isfile(db):
-        raise FileNotFoundError(db)
-
-    conn = sqlite3.connect(db)
-    conn.row_factory = sqlite3.Row
+    conn = dbs.get_connection(db)
     cursor = conn.cursor()
 
     chroms = []
@@ -41,11 +37,11 @@ def chromosomes(db: str) -> List:
         })
 
     cursor.close()
-    conn.close()
 
     return chroms
 
 
+@_cached
 def karyotypes(db: str) -> List:
     """Get the karyotypes.
 
@@ -62,39 +58,36 @@ def karyotypes(db: str) -> List:
         ORDER BY c.chromosome_num, k.seq_region_start
     '''
 
-    # prevent erroneously creating a database
-    if not os.path.isfile(db):
-        raise FileNotFoundError(db)
-
-    conn = sqlite3.connect(db)
-    conn.row_factory = sqlite3.Row
+    conn = dbs.get_connection(db)
     cursor = conn.cursor()
 
-    karyotype_data = OrderedDict()
+    karyotype_data = []
+    chrom_bands = {}
 
     for row in cursor.execute(sql_statement):
-        chrom_data = karyotype_data.get(row['chromosome'],
-                                        {'chromosome': row['chromosome'],
-                                         'length': row['chromosome_length'],
-                                         'order': row['chromosome_num'],
-                                         'karyotypes': []})
+        chrom = row['chromosome']
+        bands = chrom_bands.get(chrom)
 
-        chrom_data['karyotypes'].append(
+        if bands is None:
+            bands = chrom_bands[chrom] = []
+            karyotype_data.append({'chromosome': chrom,
+                                   'length': row['chromosome_length'],
+                                   'order': row['chromosome_num'],
+                                   'karyotypes': bands})
+
+        bands.append(
             {'seq_region_start': row['seq_region_start'],
              'seq_region_end': row['seq_region_end'],
              'band': row['band'],
              'stain': row['stain']}
         )
 
-        karyotype_data[row['chromosome']] = chrom_data
-
     cursor.close()
-    conn.close()
 
-    # turn into a list
-    return list(karyotype_data.values())
+    return karyotype_data
 
 
+@_cached
 def db_meta(db: str) -> Dict:
     """Get the database meta information..
 
@@ -111,12 +104,7 @@ def db_meta(db: str) -> Dict:
     '''
     meta_data = {}
 
-    # prevent erroneously creating a database
-    if not os.path.isfile(db):
-        raise FileNotFoundError(db)
-
-    conn = sqlite3.connect(db)
-    conn.row_factory = sqlite3.Row
+    conn = dbs.get_connection(db)
     cursor = conn.cursor()
 
     for row in cursor.execute(sql_meta):
@@ -127,11 +115,11 @@ def db_meta(db: str) -> Dict:
                 meta_data[val] = row['meta_value']
 
     cursor.close()
-    conn.close()
 
     return meta_data
 
 
+@_cached
 def stats(db: str) -> Dict:
     """Get information for the version.
 
@@ -149,12 +137,7 @@ def stats(db: str) -> Dict:
          ORDER BY sr.score desc
     '''
 
-    # prevent erroneously creating a database
-    if not os.path.isfile(db):
-        raise FileNotFoundError(db)
-
-    conn = sqlite3.connect(db)
-    conn.row_factory = sqlite3.Row
+    conn = dbs.get_connection(db)
     cursor = conn.cursor()
 
     statistics = {}
@@ -163,11 +146,11 @@ def stats(db: str) -> Dict:
         statistics[row['description']] = row['num']
 
     cursor.close()
-    conn.close()
 
     return statistics
 
 
+@_cached
 def external_dbs(db: str) -> List:
     """Get the external databases.
 
@@ -180,12 +163,7 @@ def external_dbs(db: str) -> List:
     """
     sql_statement = 'SELECT * FROM external_dbs ORDER BY external_db_key '
 
-    # prevent erroneously creating a database
-    if not os.path.isfile(db):
-        raise FileNotFoundError(db)
-
-    conn = sqlite3.connect(db)
-    conn.row_factory = sqlite3.Row
+    conn = dbs.get_connection(db)
     cursor = conn.cursor()
 
     ext_dbs = []
@@ -207,6 +185,36 @@ def external_dbs(db: str) -> List:
         })
 
     cursor.close()
-    conn.close()
 
     return ext_dbs
+
+
+@_cached
+def source_dbs(db: str) -> List[str]:
+    """Get the identifiers that are valid as a source database.
+
+    Args:
+        db: The Ensimpl database.
+
+    Returns:
+        A list of 'Ensembl', 'Ensembl_homolog' and the external database
+        identifiers.
+    """
+    valid_db_ids = ['Ensembl', 'Ensembl_homolog']
+
+    for ext_db in external_dbs(db):
+        valid_db_ids.append(ext_db['external_db_id'])
+
+    return valid_db_ids
+
+
+def warm(db: str) -> None:
+    """Load the cached meta information of a database so that the first
+    request for it does not have to query the database.
+
+    Args:
+        db: The Ensimpl database.
+    """
+    for func in (chromosomes, karyotypes, db_meta, stats, external_dbs,
+                 source_dbs):
+        func(db)
@@ -1,4 +1,3 @@
-import os
 import re
 import sqlite3
 
@@ -6,77 +5,120 @@ from typing import List
 from typing import Optional
 
 import ensimpl.utils as utils
+from ensimpl.db import dbs
 
 LOG = utils.get_logger()
 
-REGEX_ENSEMBL_MOUSE_ID = re.compile('ENSMUS([EGTP])[0-9]{11}', re.IGNORECASE)
-REGEX_ENSEMBL_HUMAN_ID = re.compile('ENS([EGTP])[0-9]{11}', re.IGNORECASE)
-REGEX_MGI_ID = re.compile('MGI:[0-9]{1,}', re.IGNORECASE)
-REGEX_REGION = re.compile('(CHR|)*\s*([0-9]{1,2}|X|Y|MT)\s*(-|:)?\s*(\d+\.*\d*)\s*(MB|M|K|)?\s*(-|:|)?\s*(\d+\.*\d*|)\s*(MB|M|K|)?', re.IGNORECASE)
+# rows fetched per call when reading the matches
+FETCH_SIZE = 1000
 
+# the unicode61 tokenizer keeps letters and numbers, anything else separates
+# tokens
+REGEX_FTS5_TOKEN = re.compile(r'[^\W_]+')
+
+# the best lookup per gene is the highest scoring, then shortest, value,
+# the genes are only joined to the one ranked row kept for each gene.  The
+# match score is the score less the length of the old
+# score||description||value match description, with its two '||'
 SQL_TERM_EXACT = '''
-SELECT MAX(s.score||'||'||s.description||'||'||l.lookup_value) AS match_description, 
-       s.score, l.ensembl_gene_id, g.*
-  FROM ensembl_genes g,
-       ensembl_genes_lookup l,
+WITH ranked AS (
+SELECT s.score - (length(s.score) + length(s.description) +
+                  length(l.lookup_value) + 4) AS match_score,
+       s.description match_reason,
+       l.lookup_value match_value,
+       l.ensembl_gene_id,
+       ROW_NUMBER() OVER (PARTITION BY l.ensembl_gene_id
+                          ORDER BY s.score DESC, length(l.lookup_value),
+                                   l.lookup_value) AS rn
+  FROM ensembl_genes_lookup l,
        search_ranking s
-WHERE g.ensembl_id = l.ensembl_gene_id
-  AND l.ranking_id = s.ranking_id
+WHERE l.ranking_id = s.ranking_id
   AND l.lookup_value = :term
-GROUP BY l.ensembl_gene_id
-ORDER BY match_description - length(match_description) DESC, g.symbol ASC
+)
+SELECT r.match_score, r.match_reason, r.match_value, r.ensembl_gene_id, g.*
+  FROM ranked r,
+       ensembl_genes g
+WHERE r.rn = 1
+  AND g.ensembl_id = r.ensembl_gene_id
+ORDER BY r.match_score DESC, g.symbol ASC
 '''
 
 SQL_TERM_LIKE = '''
-SELECT MAX(s.score||'||'||s.description||'||'||l.lookup_value) AS match_description, 
-       s.score, l.ensembl_gene_id, g.*
-  FROM ensembl_genes g,
-       ensembl_genes_lookup l,
+WITH ranked AS (
+SELECT s.score - (length(s.score) + length(s.description) +
+                  length(l.lookup_value) + 4) AS match_score,
+       s.description match_reason,
+       l.lookup_value match_value,
+       l.ensembl_gene_id,
+       ROW_NUMBER() OVER (PARTITION BY l.ensembl_gene_id
+                          ORDER BY s.score DESC, length(l.lookup_value),
+                                   l.lookup_value) AS rn
+  FROM ensembl_genes_lookup l,
        ensembl_search es,
        search_ranking s
-WHERE g.ensembl_id = l.ensembl_gene_id
-  AND l.ranking_id = s.ranking_id
+WHERE l.ranking_id = s.ranking_id
   AND es.ensembl_genes_lookup_key = l.ensembl_genes_lookup_key
   AND es.lookup_value MATCH :term
-GROUP BY l.ensembl_gene_id
-ORDER BY match_description - length(match_description) DESC, g.symbol ASC
+)
+SELECT r.match_score, r.match_reason, r.match_value, r.ensembl_gene_id, g.*
+  FROM ranked r,
+       ensembl_genes g
+WHERE r.rn = 1
+  AND g.ensembl_id = r.ensembl_gene_id
+ORDER BY r.match_score DESC, g.symbol ASC
 '''
 
-SQL_ID = '''
-SELECT MAX(s.score||'||'||s.description||'||'||l.lookup_value) AS match_description, 
-       s.score, l.ensembl_gene_id, g.*
-  FROM ensembl_genes g,
-       ensembl_genes_lookup l,
-       ensembl_search es,
+# ids are matched whole, so idx_lookup_value_ranking_id is used rather
+# than the full text index
+SQL_ID_EXACT = '''
+WITH ranked AS (
+SELECT s.score - (length(s.score) + length(s.description) +
+                  length(l.lookup_value) + 4) AS match_score,
+       s.description match_reason,
+       l.lookup_value match_value,
+       l.ensembl_gene_id,
+       ROW_NUMBER() OVER (PARTITION BY l.ensembl_gene_id
+                          ORDER BY s.score DESC, length(l.lookup_value),
+                                   l.lookup_value) AS rn
+  FROM ensembl_genes_lookup l,
        search_ranking s
-WHERE g.ensembl_id = l.ensembl_gene_id
-  AND l.ranking_id = s.ranking_id
-  AND es.ensembl_genes_lookup_key = l.ensembl_genes_lookup_key
+WHERE l.ranking_id = s.ranking_id
+  AND l.lookup_value = :term
   AND l.ranking_id in ('EG', 'ET', 'EE', 'EP', 'ZG', 'MI', 'UG', 'HG')
-  AND es.lookup_value MATCH :term
-GROUP BY l.ensembl_gene_id
-ORDER BY match_description - length(match_description) DESC, g.symbol ASC
+)
+SELECT r.match_score, r.match_reason, r.match_value, r.ensembl_gene_id, g.*
+  FROM ranked r,
+       ensembl_genes g
+WHERE r.rn = 1
+  AND g.ensembl_id = r.ensembl_gene_id
+ORDER BY r.match_score DESC, g.symbol ASC
 '''
 
+# a single chromosome, so idx_ensembl_genes_region returns the genes in order
 SQL_REGION = '''
 SELECT *
   FROM ensembl_genes e
  WHERE e.chromosome = :chromosome
    AND e.start_position <= :end_position
    AND e.end_position >= :start_position
- ORDER BY cast(
-       replace(replace(replace(e.chromosome,'X','50'),'Y','51'),'MT','51') 
-       AS int), e.start_position, e.end_position
+ ORDER BY e.start_position, e.end_position
 '''
 
 QUERIES = {
     'SQL_TERM_EXACT':  SQL_TERM_EXACT,
     'SQL_TERM_LIKE': SQL_TERM_LIKE,
-    'SQL_ID': SQL_ID,
+    'SQL_ID_EXACT': SQL_ID_EXACT,
     'SQL_REGION': SQL_REGION
 }
 
 
+SQL_SEARCH_MODULE = '''
+SELECT sql
+  FROM sqlite_master
+ WHERE name = 'ensembl_search'
+'''
+
+
 class SearchException(Exception):
     """Search exception class."""
     pass
@@ -120,6 +162,12 @@ class Query:
 class Match:
     """Represent a match object.
     """
+    # no per instance __dict__, a search can build thousands of matches
+    __slots__ = ('ensembl_gene_id', 'ensembl_version', 'external_ids',
+                 'species', 'symbol', 'name', 'synonyms', 'chromosome',
+                 'position_start', 'position_end', 'strand', 'homolog_ids',
+                 'match_reason', 'match_value', 'score')
+
     def __init__(self, ensembl_gene_id=None, ensembl_version=None,
                  external_ids=None, symbol=None, name=None, synonyms=None,
                  species=None, chromosome=None, position_start=None,
@@ -172,7 +220,7 @@ class Match:
         Returns:
             dict: With keys representing all the attributes.
         """
-        return self.__dict__
+        return {key: getattr(self, key) for key in self.__slots__}
 
 
 class Result:
@@ -195,6 +243,52 @@ class Result:
         self.num_results = num_results
 
 
+@dbs.cached_per_db()
+def _is_fts5(db: str) -> bool:
+    """Whether the ``ensembl_search`` table of `db` is an FTS5 table, older
+    databases use FTS4.
+
+    Args:
+        db: The Ensimpl database.
+
+    Returns:
+        True for FTS5.
+    """
+    cursor = dbs.get_connection(db).cursor()
+    row = cursor.execute(SQL_SEARCH_MODULE).fetchone()
+    cursor.close()
+
+    return bool(row and 'fts5' in row['sql'].lower())
+
+
+def fts5_term(term: str) -> str:
+    """Quote each token of `term` for an FTS5 MATCH.  FTS5 reads characters
+    such as ``:`` and ``-`` as query syntax, so ``MGI:9003`` would be a
+    column filter, while FTS4 matched them as text.  Words are split the way
+    the unicode61 tokenizer splits them, so ``Gene1.5*`` is ``"Gene1" "5"*``
+    as it was on FTS4 rather than a phrase.  A trailing ``*`` is kept as a
+    prefix query on the last token.
+
+    Args:
+        term: The search term.
+
+    Returns:
+        The FTS5 query.
+    """
+    tokens = []
+
+    for word in term.split():
+        word_tokens = REGEX_FTS5_TOKEN.findall(word)
+
+        if word_tokens:
+            tokens.extend(f'"{token}"' for token in word_tokens)
+
+            if word.endswith('*'):
+                tokens[-1] += '*'
+
+    return ' '.join(tokens)
+
+
 def get_query(term: str, exact: Optional[bool] = True) -> Query:
     """Get query based upon parameters
 
@@ -218,15 +312,26 @@ def get_query(term: str, exact: Optional[bool] = True) -> Query:
 
     query = Query(term, exact)
 
-    if REGEX_ENSEMBL_MOUSE_ID.match(valid_term):
-        query.query = QUERIES['SQL_ID']
-    elif REGEX_ENSEMBL_HUMAN_ID.match(valid_term):
-        query.query = QUERIES['SQL_ID']
-    elif REGEX_MGI_ID.match(valid_term):
-        query.query = QUERIES['SQL_ID']
-    elif REGEX_REGION.match(valid_term) and utils.is_valid_region(term):
+    # only run the regular expressions the term's prefix can match
+    upper_term = valid_term.upper()
+    region = None
+
+    if upper_term.startswith('ENS'):
+        is_id = bool(utils.REGEX_ENSEMBL_ID.match(valid_term))
+    elif upper_term.startswith('MGI:'):
+        is_id = bool(utils.REGEX_MGI_ID.match(valid_term))
+    else:
+        is_id = False
+
+        if utils.is_valid_region(valid_term):
+            region = utils.str_to_region(valid_term)
+
+    if is_id:
+        query.query = QUERIES['SQL_ID_EXACT']
+        query.term = valid_term
+    elif region:
         query.query = QUERIES['SQL_REGION']
-        query.region = utils.str_to_region(term)
+        query.region = region
     else:
         if exact:
             query.query = QUERIES['SQL_TERM_EXACT']
@@ -261,75 +366,102 @@ def execute_query(db: str, query: Query, limit: Optional[int] = None) -> Result:
     matches = []
     ilimit = utils.nvli(limit, -1)
 
-    try:
-        # prevent erroneously creating a database
-        if not os.path.isfile(db):
-            raise FileNotFoundError(db)
+    # sqlite treats a negative LIMIT as no limit
+    if not limit or ilimit < 0:
+        ilimit = -1
 
-        conn = sqlite3.connect(db)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+    num_matches = 0
+
+    try:
+        conn = dbs.get_connection(db)
 
         gene_id = 'ensembl_gene_id'
         if query.region:
             gene_id = 'ensembl_id'
 
-        for row in cursor.execute(query.query, query.get_parameters()):
-            match = Match()
-
-            match.ensembl_gene_id = row[gene_id]
-            match.ensembl_version = row['ensembl_version']
-            match.species = row['species_id']
-            match.symbol = row['symbol']
-            match.name = row['name']
-
-            row_external_ids = row['external_ids']
-            external_ids = []
-            if row_external_ids:
-                tmp_external_ids = row_external_ids.split('||')
-                for e in tmp_external_ids:
-                    elem = e.split('/')
-                    external_ids.append({'db': elem[0], 'db_id': elem[1]})
-            match.external_ids = external_ids
-
-            row_homolog_ids = row['homolog_ids']
-            homolog_ids = []
-            if row_homolog_ids:
-                tmp_homolog_ids = row_homolog_ids.split('||')
-                for h in tmp_homolog_ids:
-                    elem = h.split('/')
-                    homolog_ids.append({'homolog_id': elem[0],
-                                        'homolog_symbol': elem[1]})
-            match.homolog_ids = homolog_ids
-
-            row_synonyms = row['synonyms']
-            synonyms = []
-            if row_synonyms:
-                synonyms = row_synonyms.split('||')
-
-            match.synonyms = synonyms
-            match.chromosome = row['chromosome']
-            match.position_start = row['start_position']
-            match.position_end = row['end_position']
-            match.strand = '+' if row['strand'] > 0 else '-'
-
-            if query.region:
-                match.match_reason = 'Region'
-                match.match_value = '{}:{}-{}'.format(str(match.chromosome),
-                                                      str(match.position_start),
-                                                      str(match.position_end))
-            else:
-                row_match_description = row['match_description']
-                if row_match_description:
-                    desc = row_match_description.split('||')
-                match.match_reason = desc[1]
-                match.match_value = desc[2]
-                match.score = row['score'] - len(row_match_description)
-
-            matches.append(match)
+        params = query.get_parameters()
+        params['limit'] = ilimit
+
+        if query.query == SQL_TERM_LIKE:
+            if _is_fts5(db):
+                params['term'] = fts5_term(params['term'])
+
+        # the limit is applied by sqlite so that no discarded rows are built,
+        # the sql is always one of the QUERIES so the prepared statement is
+        # reused from the connection's statement cache
+        cursor = conn.execute(f'{query.query} LIMIT :limit', params)
+        cursor.arraysize = FETCH_SIZE
+
+        # rows are read as plain tuples, the column positions are looked up
+        # once rather than by name for every field of every row
+        cursor.row_factory = None
+        columns = {col[0]: i for i, col in enumerate(cursor.description)}
+
+        (col_gene_id, col_version, col_species, col_symbol, col_name,
+         col_external_ids, col_homolog_ids, col_synonyms, col_chromosome,
+         col_start, col_end, col_strand) = (
+            columns[name] for name in (
+                gene_id, 'ensembl_version', 'species_id', 'symbol', 'name',
+                'external_ids', 'homolog_ids', 'synonyms', 'chromosome',
+                'start_position', 'end_position', 'strand'))
+
+        if not query.region:
+            col_reason = columns['match_reason']
+            col_value = columns['match_value']
+            col_score = columns['match_score']
+
+        for rows in iter(cursor.fetchmany, []):
+            for row in rows:
+                match = Match()
+
+                match.ensembl_gene_id = row[col_gene_id]
+                match.ensembl_version = row[col_version]
+                match.species = row[col_species]
+                match.symbol = row[col_symbol]
+                match.name = row[col_name]
+
+                row_external_ids = row[col_external_ids]
+                match.external_ids = [
+                    {'db': elem[0], 'db_id': elem[1]}
+                    for elem in (e.split('/')
+                                 for e in row_external_ids.split('||'))
+                ] if row_external_ids else []
+
+                row_homolog_ids = row[col_homolog_ids]
+                match.homolog_ids = [
+                    {'homolog_id': elem[0], 'homolog_symbol': elem[1]}
+                    for elem in (h.split('/')
+                                 for h in row_homolog_ids.split('||'))
+                ] if row_homolog_ids else []
+
+                row_synonyms = row[col_synonyms]
+                match.synonyms = \
+                    row_synonyms.split('||') if row_synonyms else []
+                match.chromosome = row[col_chromosome]
+                match.position_start = row[col_start]
+                match.position_end = row[col_end]
+                match.strand = '+' if row[col_strand] > 0 else '-'
+
+                if query.region:
+                    match.match_reason = 'Region'
+                    match.match_value = '{}:{}-{}'.format(
+                        str(match.chromosome), str(match.position_start),
+                        str(match.position_end))
+                else:
+                    match.match_reason = row[col_reason]
+                    match.match_value = row[col_value]
+                    match.score = row[col_score]
+
+                matches.append(match)
+
+        num_matches = len(matches)
+
+        # only count the matches when the limit may have cut them short
+        if num_matches == ilimit:
+            num_matches = conn.execute(
+                f'SELECT count(*) FROM ({query.query})', params).fetchone()[0]
 
         cursor.close()
-        conn.close()
     except sqlite3.Error as e:
         LOG.error('Database Error: {}'.format(e))
         raise SearchException(e)
@@ -337,11 +469,6 @@ def execute_query(db: str, query: Query, limit: Optional[int] = None) -> Result:
         LOG.error('Search Error: {}'.format(e))
         raise SearchException(e)
 
-    num_matches = len(matches)
-
-    if limit and len(matches) > ilimit:
-        matches = matches[:ilimit]
-
     return Result(query, matches, num_matches)
 
 
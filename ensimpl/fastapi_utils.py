@@ -1,8 +1,18 @@
-import gzip
-import io
+import zlib
+
+# isal (Intel ISA-L), when installed, provides a faster drop in replacement
+# for zlib, its compression levels only go up to ISAL_MAX_LEVEL so higher
+# levels use zlib
+try:
+    from isal import isal_zlib
+except ImportError:
+    isal_zlib = None
+
+ISAL_MAX_LEVEL = 3
 
 from starlette.datastructures import Headers
 from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
 from starlette.types import ASGIApp
 from starlette.types import Message
 from starlette.types import Receive
@@ -10,16 +20,32 @@ from starlette.types import Scope
 from starlette.types import Send
 
 
+def not_modified(request: Request, etag: str) -> bool:
+    """Check if the client already has the response with `etag`.
+
+    Args:
+        request: The request.
+        etag: The quoted ETag of the current response.
+
+    Returns:
+        True if `etag` is in the If-None-Match header.
+    """
+    if_none_match = request.headers.get('if-none-match', '')
+    return etag in (tag.strip() for tag in if_none_match.split(','))
+
+
 class GZipCompressionMiddleware:
     def __init__(self, app: ASGIApp, minimum_size: int = 500,
-                 compression_level: int = 9) -> None:
+                 compression_level: int = 3) -> None:
         self.app = app
         self.minimum_size = minimum_size
         self.compression_level = compression_level
 
     async def __call__(self, scope: Scope, receive: Receive,
                        send: Send) -> None:
-        if scope["type"] == "http":
+        # preflight and HEAD responses have no body worth compressing
+        if scope["type"] == "http" and \
+                scope.get("method") not in ("OPTIONS", "HEAD"):
             headers = Headers(scope=scope)
             if "gzip" in headers.get("Accept-Encoding", ""):
                 responder = GZipCompressionResponder(self.app,
@@ -32,15 +58,22 @@ class GZipCompressionMiddleware:
 
 class GZipCompressionResponder:
     def __init__(self, app: ASGIApp, minimum_size: int,
-                 compression_level: int = 9) -> None:
+                 compression_level: int = 3) -> None:
         self.app = app
         self.minimum_size = minimum_size
         self.send = unattached_send  # type: Send
         self.initial_message = {}  # type: Message
         self.started = False
-        self.gzip_buffer = io.BytesIO()
-        self.gzip_file = gzip.GzipFile(mode="wb", fileobj=self.gzip_buffer,
-                                       compresslevel=compression_level)
+        self.passthrough = False
+        if isal_zlib is not None and compression_level <= ISAL_MAX_LEVEL:
+            self.zlib = isal_zlib
+        else:
+            self.zlib = zlib
+
+        # wbits of 31 (16 + MAX_WBITS) makes zlib write the gzip wrapper
+        self.compressor = self.zlib.compressobj(compression_level,
+                                                self.zlib.DEFLATED,
+                                                16 + self.zlib.MAX_WBITS)
 
     async def __call__(self, scope: Scope, receive: Receive,
                        send: Send) -> None:
@@ -57,15 +90,20 @@ class GZipCompressionResponder:
             self.started = True
             body = message.get("body", b"")
             more_body = message.get("more_body", False)
-            if len(body) < self.minimum_size and not more_body:
+            initial_headers = Headers(raw=self.initial_message["headers"])
+            if "content-encoding" in initial_headers:
+                # Already encoded, such as a precompressed response.
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+            elif len(body) < self.minimum_size and not more_body:
                 # Don't apply GZip to small outgoing responses.
                 await self.send(self.initial_message)
                 await self.send(message)
             elif not more_body:
                 # Standard GZip response.
-                self.gzip_file.write(body)
-                self.gzip_file.close()
-                body = self.gzip_buffer.getvalue()
+                body = self.compressor.compress(body) + \
+                    self.compressor.flush(self.zlib.Z_FINISH)
 
                 headers = MutableHeaders(raw=self.initial_message["headers"])
                 headers["Content-Encoding"] = "gzip"
@@ -82,26 +120,22 @@ class GZipCompressionResponder:
                 headers.add_vary_header("Accept-Encoding")
                 del headers["Content-Length"]
 
-                self.gzip_file.write(body)
-                message["body"] = self.gzip_buffer.getvalue()
-                self.gzip_buffer.seek(0)
-                self.gzip_buffer.truncate()
+                message["body"] = self.compressor.compress(body) + \
+                    self.compressor.flush(self.zlib.Z_SYNC_FLUSH)
 
                 await self.send(self.initial_message)
                 await self.send(message)
 
+        elif message_type == "http.response.body" and self.passthrough:
+            await self.send(message)
         elif message_type == "http.response.body":
             # Remaining body in streaming GZip response.
             body = message.get("body", b"")
             more_body = message.get("more_body", False)
 
-            self.gzip_file.write(body)
-            if not more_body:
-                self.gzip_file.close()
-
-            message["body"] = self.gzip_buffer.getvalue()
-            self.gzip_buffer.seek(0)
-            self.gzip_buffer.truncate()
+            message["body"] = self.compressor.compress(body) + \
+                self.compressor.flush(self.zlib.Z_SYNC_FLUSH if more_body
+                                      else self.zlib.Z_FINISH)
 
             await self.send(message)
 
@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import os
 
 from fastapi import FastAPI
@@ -9,15 +11,19 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.responses import HTMLResponse
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from typing import Optional
 
 
 from ensimpl.fastapi_utils import GZipCompressionMiddleware
+from ensimpl.fastapi_utils import not_modified
 from ensimpl.routers import api
 import ensimpl.db.dbs as dbs
+import ensimpl.utils as utils
+
+LOG = utils.get_logger()
 
 template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                             'templates')
@@ -25,13 +31,17 @@ templates = Jinja2Templates(directory=template_dir)
 
 static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
 
+# the favicon and scripts only change with a release
+CACHE_CONTROL_STATIC = 'public, max-age=3600'
+
 # TODO: maybe a factory
 # figure out config and what all the options do
 app = FastAPI(
     title='Ensimpl',
     description='Quicker Ensembl',
     version='1.0.0',
-    root_path=os.environ.get('ROOT_PATH'))
+    root_path=os.environ.get('ROOT_PATH'),
+    default_response_class=ORJSONResponse)
 
 app.mount('/static', StaticFiles(directory=static_dir), name='static')
 
@@ -39,10 +49,13 @@ app.mount('/static', StaticFiles(directory=static_dir), name='static')
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request,
                                        exc: RequestValidationError):
-    for h in request.headers:
-        print(h, request.headers[h])
+    # the headers are only formatted when debug logging is on
+    LOG.debug('Invalid request: %s %s %s', request.method, request.url,
+              request.headers)
 
-    return JSONResponse(
+    # jsonable_encoder converts the error contexts and the body, orjson
+    # encodes the result
+    return api.CustomORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content=jsonable_encoder({'detail': exc.errors(), 'body': exc.body}),
     )
@@ -71,18 +84,127 @@ app.include_router(api.router)
 
 @app.on_event('startup')
 async def startup():
-    ensimpl_dbs, ensimpl_dbs_dict = dbs.init()
+    loop = asyncio.get_running_loop()
+
+    ensimpl_dbs, ensimpl_dbs_dict = await loop.run_in_executor(None, dbs.init)
     app.state.dbs = ensimpl_dbs
     app.state.dbs_dict = ensimpl_dbs_dict
+
+    # the databases of each species, newest release first, and the position
+    # of each release in them, so /history can slice out a range of
+    # releases without scanning the list
+    app.state.species_dbs = {}
+    app.state.dbs_index = {}
+    for entry in ensimpl_dbs:
+        species_dbs = app.state.species_dbs.setdefault(entry['species'], [])
+        app.state.dbs_index[(entry['release'], entry['species'])] = \
+            len(species_dbs)
+        species_dbs.append(entry['db'])
+    app.state.releases_body = None
+
+    # the meta information never changes, load it and build the meta
+    # responses before the first request, each database is read in its own
+    # worker thread
+    await asyncio.gather(*(loop.run_in_executor(None, api.warm, entry['db'])
+                           for entry in ensimpl_dbs))
+
     app.state.url_prefix = ''
     if os.environ.get('URL_PREFIX') is not None:
         app.state.url_prefix = os.environ.get('URL_PREFIX')
 
+    # the templates only change with a release
+    app.state.templates_mtime_ns = max(entry.stat().st_mtime_ns
+                                       for entry in os.scandir(template_dir))
+
+
+def template_etag(request: Request) -> str:
+    """Get the ETag of a rendered template.
+
+    A page depends on the templates it extends and includes, so the newest
+    template modification time, read at startup, is used along with the url
+    and url prefix.  The tag is weak since the compression middleware may
+    change the body.
+
+    Args:
+        request: The request for the page.
+
+    Returns:
+        The quoted ETag.
+    """
+    key = (f'{app.state.templates_mtime_ns}:{app.state.url_prefix}:'
+           f'{request.url}')
+    return f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def template_response(request: Request, name: str, context: dict,
+                      **kwargs) -> Response:
+    """Render a template, or respond with 304 Not Modified when the client
+    already has the current page.
+
+    Args:
+        request: The request for the page.
+        name: The template name.
+        context: The template context.
+        **kwargs: Passed to ``templates.TemplateResponse``.
+
+    Returns:
+        The response.
+    """
+    etag = template_etag(request)
+
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers={'ETag': etag})
+
+    response = templates.TemplateResponse(name, context, **kwargs)
+    response.headers['ETag'] = etag
+
+    return response
+
+
+# rendered scripts keyed by template name, each holds the template mtime and
+# url prefix it was rendered with, the ETag and the body
+scripts = {}
+
+
+def script_response(request: Request, name: str) -> Response:
+    """Respond with a script template.  A script only depends on the
+    template and the url prefix, so it is rendered once and the bytes are
+    reused until the template changes.
+
+    Args:
+        request: The request for the script.
+        name: The template name.
+
+    Returns:
+        The response.
+    """
+    key = (os.stat(os.path.join(template_dir, name)).st_mtime_ns,
+           app.state.url_prefix)
+    cached = scripts.get(name)
+
+    if cached is None or cached[0] != key:
+        body = templates.get_template(name).render(
+            {'request': request, 'app': app}).encode()
+        # weak, the compression middleware may change the body
+        cached = (key, f'W/"{hashlib.md5(body).hexdigest()}"', body)
+        scripts[name] = cached
+
+    _, etag, body = cached
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL_STATIC}
+
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers=headers)
+
+    return Response(body, media_type='application/javascript',
+                    headers=headers)
+
 
 @app.get('/', response_class=HTMLResponse)
 async def index_html(request: Request):
-    return templates.TemplateResponse('index.html',
-                                      {'request': request, 'app': app})
+    return template_response(request, 'index.html',
+                             {'request': request, 'app': app})
 
 
 @app.get('/ping')
@@ -97,7 +219,8 @@ async def favicon():
     return FileResponse(path=file_path,
                         headers={
                             'Content-Disposition':
-                                f'attachment; filename={file_name}'
+                                f'attachment; filename={file_name}',
+                            'Cache-Control': CACHE_CONTROL_STATIC
                         })
 
 
@@ -116,48 +239,44 @@ async def search_html(request: Request, response: Response,
         'app': app
     }
 
-    return templates.TemplateResponse('search.html', options)
+    return template_response(request, 'search.html', options)
 
 
 @app.get('/navigator', response_class=HTMLResponse)
 async def navigator_html(request: Request):
-    return templates.TemplateResponse('navigator.html',
-                                      {'request': request, 'app': app})
+    return template_response(request, 'navigator.html',
+                             {'request': request, 'app': app})
 
 
 @app.get('/lookup', response_class=HTMLResponse)
 async def lookup_html(request: Request):
-    return templates.TemplateResponse('lookup.html',
-                                      {'request': request, 'app': app})
+    return template_response(request, 'lookup.html',
+                             {'request': request, 'app': app})
 
 
 @app.get('/external_ids', response_class=HTMLResponse)
 async def external_ids_html(request: Request):
-    return templates.TemplateResponse('external_ids.html',
-                                      {'request': request, 'app': app})
+    return template_response(request, 'external_ids.html',
+                             {'request': request, 'app': app})
 
 
 @app.get('/history', response_class=HTMLResponse)
 async def history_html(request: Request):
-    return templates.TemplateResponse('history.html',
-                                      {'request': request, 'app': app})
+    return template_response(request, 'history.html',
+                             {'request': request, 'app': app})
 
 
 @app.get('/help', response_class=HTMLResponse)
 async def help_html(request: Request):
-    return templates.TemplateResponse('help.html',
-                                      {'request': request, 'app': app})
+    return template_response(request, 'help.html',
+                             {'request': request, 'app': app})
 
 
 @app.get('/js/karyotype.js', response_class=HTMLResponse)
 async def karyotype_js(request: Request):
-    return templates.TemplateResponse('karyotype.js',
-                                      {'request': request, 'app': app},
-                                      media_type='application/javascript')
+    return script_response(request, 'karyotype.js')
 
 
 @app.get('/js/ensimpl.js', response_class=HTMLResponse)
 async def ensimpl_js(request: Request):
-    return templates.TemplateResponse('ensimpl.js',
-                                      {'request': request, 'app': app},
-                                      media_type='application/javascript')
+    return script_response(request, 'ensimpl.js')
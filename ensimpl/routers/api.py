@@ -1,12 +1,17 @@
 # Standard library imports
+import gzip
+import hashlib
 import inspect
 import json
 from datetime import datetime
 from functools import wraps
 from json import JSONDecodeError
 from typing import Any
+from typing import Callable
+from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
 
 # 3rd party imports
 import orjson
@@ -17,17 +22,20 @@ from fastapi import Response
 from fastapi import status
 from fastapi.responses import JSONResponse
 from fastapi.responses import ORJSONResponse
-from fastapi.responses import UJSONResponse
-from natsort import natsorted
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
 # local imports
 from ensimpl import utils
+from ensimpl.fastapi_utils import not_modified
 from ensimpl.db import dbs
 from ensimpl.db import genes as genesdb
 from ensimpl.db import meta
 from ensimpl.db import search as searchdb
 
+LOG = utils.get_logger()
+
 router = APIRouter(
     prefix="/api",
     tags=["api"],
@@ -35,6 +43,9 @@ router = APIRouter(
 )
 
 
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+
 def default(obj):
     """
     Custom parser for orjson (usually named default)
@@ -59,11 +70,79 @@ class CustomORJSONResponse(ORJSONResponse):
     """
 
     def render(self, content: Any) -> bytes:
-        assert orjson is not None, \
-            "orjson must be installed to use ORJSONResponse"
-        return orjson.dumps(
-            content, option=orjson.OPT_PASSTHROUGH_DATETIME, default=default
-        )
+        # orjson is a hard dependency here, unlike for ORJSONResponse
+        return dumps(content)
+
+
+def dumps(content: Any) -> bytes:
+    """Encode `content` the same way as :class:`CustomORJSONResponse`."""
+    return orjson.dumps(content, option=ORJSON_OPTIONS, default=default)
+
+
+# responses with more items than this are streamed, the items are encoded
+# STREAM_BATCH_SIZE at a time
+STREAM_MIN_ITEMS = 1000
+STREAM_BATCH_SIZE = 1000
+
+
+def _split_document(content: Dict, path: Tuple[str, ...]) -> Tuple[bytes,
+                                                                   bytes]:
+    """Encode `content` in two parts, before and after the value at `path`.
+
+    Args:
+        content: The document.
+        path: The keys leading to the value, a missing last key is added
+            after the other keys.
+
+    Returns:
+        A tuple of the encoded head and tail.
+    """
+    if not path:
+        return b'', b''
+
+    key = path[0]
+    keys = list(content)
+    position = keys.index(key) if key in keys else len(keys)
+    before = {k: content[k] for k in keys[:position]}
+    after = {k: content[k] for k in keys[position + 1:]}
+    head, tail = _split_document(content.get(key, {}), path[1:])
+
+    head = b'{' + (dumps(before)[1:-1] + b',' if before else b'') + \
+        dumps(key) + b':' + head
+    tail = tail + (b',' + dumps(after)[1:-1] if after else b'') + b'}'
+
+    return head, tail
+
+
+def stream_response(content: Dict, path: Tuple[str, ...], items: List,
+                    encode: Callable[[Any], bytes],
+                    brackets: bytes = b'[]') -> StreamingResponse:
+    """Stream a JSON response in batches of items rather than encoding the
+    whole document at once.
+
+    Args:
+        content: The response without the items.
+        path: The keys leading to where the items go in `content`.
+        items: The items.
+        encode: Encodes an item, for a dict it must encode ``"key":value``.
+        brackets: ``b'[]'`` to stream a list, ``b'{}'`` for a dict.
+
+    Returns:
+        The response.
+    """
+    head, tail = _split_document(content, path)
+
+    def body():
+        yield head + brackets[:1]
+
+        for i in range(0, len(items), STREAM_BATCH_SIZE):
+            batch = b','.join(
+                encode(item) for item in items[i:i + STREAM_BATCH_SIZE])
+            yield batch if i == 0 else b',' + batch
+
+        yield brackets[1:] + tail
+
+    return StreamingResponse(body(), media_type='application/json')
 
 
 class CustomJSONResponse(JSONResponse):
@@ -100,6 +179,144 @@ def go_fast(f):
         return wrapped
 
 
+CACHE_CONTROL_META = 'public, max-age=3600'
+
+# the responses that only depend on the database, they are encoded and
+# compressed once and served as bytes
+META_RESPONSES = {
+    'stats': lambda db: {'meta': meta.db_meta(db), 'stats': meta.stats(db)},
+    'chromosomes': lambda db: {'meta': meta.db_meta(db),
+                               'chromosomes': meta.chromosomes(db)},
+    'karyotypes': lambda db: {'meta': meta.db_meta(db),
+                              'chromosomes': meta.karyotypes(db)},
+    'external_dbs': lambda db: {'meta': meta.db_meta(db),
+                                'external_dbs': meta.external_dbs(db)},
+}
+
+
+@dbs.cached_per_db(maxsize=1024)
+def _meta_body(db: str, name: str) -> tuple:
+    """Get the JSON body of a meta response.
+
+    Args:
+        db: The Ensimpl database.
+        name: The key of the response in ``META_RESPONSES``.
+
+    Returns:
+        A tuple of the JSON body, the gzip compressed JSON body and the
+        ETag of the body.
+    """
+    body = dumps(META_RESPONSES[name](db))
+
+    # weak, so the same tag validates the identity and gzip bodies
+    etag = f'W/"{hashlib.md5(body).hexdigest()}"'
+
+    return body, gzip.compress(body, compresslevel=9, mtime=0), etag
+
+
+def meta_response(request: Request, db: str, name: str) -> Response:
+    """Respond with a precompressed meta response when the client accepts
+    gzip, the compression middleware leaves it as it is.  The response only
+    changes when the database does, so clients may cache it and revalidate
+    with the ETag.
+
+    Args:
+        request: The request.
+        db: The Ensimpl database.
+        name: The key of the response in ``META_RESPONSES``.
+
+    Returns:
+        The response.
+    """
+    body, compressed, etag = _meta_body(db, name)
+    # every variant carries Vary so shared caches keep them apart
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL_META,
+               'Vary': 'Accept-Encoding'}
+
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers=headers)
+
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        headers['Content-Encoding'] = 'gzip'
+        return Response(compressed, media_type='application/json',
+                        headers=headers)
+
+    return Response(body, media_type='application/json', headers=headers)
+
+
+def warm(db: str) -> None:
+    """Load the meta information of a database and build its meta responses.
+
+    Args:
+        db: The Ensimpl database.
+    """
+    meta.warm(db)
+
+    for name in META_RESPONSES:
+        _meta_body(db, name)
+
+
+@dbs.cached_per_db(maxsize=4096)
+def _gene(db: str, ensembl_id: str, details: bool) -> Dict:
+    """Get a single gene.
+
+    Args:
+        db: The Ensimpl database.
+        ensembl_id: The Ensembl identifier.
+        details: True to also get the transcripts, exons and proteins.
+
+    Returns:
+        The genes found, see :func:`genesdb.get`.
+    """
+    return genesdb.get(db, ids=[ensembl_id], details=details)
+
+
+async def json_release_species(request: Request) -> Tuple[str, str, Dict]:
+    """Parse the JSON body of a request, which must have the release and
+    species.
+
+    Args:
+        request: The request.
+
+    Returns:
+        A tuple of the release, the species and the parsed body.
+
+    Raises:
+        JSONDecodeError: If the body is not valid JSON.
+        Exception: If the release or species is missing.
+    """
+    json_data = orjson.loads(await request.body())
+
+    for key in ('release', 'species'):
+        if key not in json_data:
+            raise Exception(f'{key} value is missing')
+
+    return json_data['release'], json_data['species'], json_data
+
+
+def valid_ids(ids: Any) -> List[str]:
+    """Check the ids sent to a route.  An empty list would otherwise select
+    every gene in the database.
+
+    Args:
+        ids: A list of ids or a single id.
+
+    Returns:
+        The list of ids.
+
+    Raises:
+        Exception: If there are no ids.
+    """
+    if isinstance(ids, str):
+        ids = [ids]
+
+    if not ids:
+        raise Exception('No ids specified')
+
+    return ids
+
+
 @router.get("/releases")
 async def releases(request: Request, response: Response):
     """
@@ -119,23 +336,26 @@ async def releases(request: Request, response: Response):
     If an error occurs, a JSON response will be sent back with just one
     element called **message** along with a status code of **404**.
     """
-    ret = []
-
     try:
-        for database in request.app.state.dbs:
-            ret.append({
+        # the databases are found once at startup, so is the response body
+        body = getattr(request.app.state, 'releases_body', None)
+
+        if body is None:
+            body = orjson.dumps([{
                 'release': database['release'],
                 'species': database['species'],
                 'greedy_release': database['greedy_release'],
                 'assembly': database['assembly'],
                 'assembly_patch': database['assembly_patch'],
                 'url': database['url']
-            })
+            } for database in request.app.state.dbs])
+
+            request.app.state.releases_body = body
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
-    return CustomORJSONResponse(ret)
+    return Response(body, media_type='application/json')
 
 
 @router.get("/stats")
@@ -159,17 +379,12 @@ async def stats(request: Request, response: Response,
     If an error occurs, a JSON response will be sent back with just one
     element called **message** along with a status code of **404**.
     """
-    ret = {}
-
     try:
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
-        ret['meta'] = meta.db_meta(db)
-        ret['stats'] = meta.stats(db)
+        return meta_response(request, db, 'stats')
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
-
-    return CustomORJSONResponse(ret)
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
 
 @router.get("/chromosomes")
@@ -189,17 +404,12 @@ async def chromosomes(request: Request, response: Response,
     If an error occurs, a JSON response will be sent back with just one
     element called **message** along with a status code of **404**.
     """
-    ret = {}
-
     try:
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
-        ret['meta'] = meta.db_meta(db)
-        ret['chromosomes'] = meta.chromosomes(db)
+        return meta_response(request, db, 'chromosomes')
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
-
-    return CustomORJSONResponse(ret)
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
 
 @router.get("/karyotypes")
@@ -230,17 +440,12 @@ async def karyotypes(request: Request, response: Response,
     If an error occurs, a JSON response will be sent back with just one
     element called **message** along with a status code of **404**.
     """
-    ret = {}
-
     try:
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
-        ret['meta'] = meta.db_meta(db)
-        ret['chromosomes'] = meta.karyotypes(db)
+        return meta_response(request, db, 'karyotypes')
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
-
-    return CustomORJSONResponse(ret)
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
 
 @router.get("/gene/{ensembl_id}")
@@ -311,7 +516,8 @@ async def gene(request: Request, response: Response,
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
         ret['meta'] = meta.db_meta(db)
 
-        results = genesdb.get(db, ids=[ensembl_id], details=details)
+        results = await run_in_threadpool(_gene, db, ensembl_id,
+                                          bool(details))
 
         if len(results) == 0:
             raise Exception(f'No results found for: {ensembl_id}')
@@ -321,8 +527,8 @@ async def gene(request: Request, response: Response,
 
         ret['gene'] = results
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
     return CustomORJSONResponse(ret)
 
@@ -343,30 +549,30 @@ async def genes_model(request: Request, response: Response, gq: GQ):
                               request.app.state.dbs_dict)
         ret['meta'] = meta.db_meta(db)
 
-        results = genesdb.get(db, ids=gq.ids, details=gq.details)
+        results = await run_in_threadpool(genesdb.get, db, ids=gq.ids,
+                                          details=gq.details)
 
         if len(results) == 0:
             raise Exception(f'No results found')
 
         ret['genes'] = results
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
-    return ret
+    return CustomORJSONResponse(ret)
 
 
 @router.post("/genesdebug")
 async def genes_post(request: Request):
-    for h in request.headers:
-        print(h, request.headers[h])
-
     b = await request.body()
-    print(b)
 
-    return {
+    # only formatted when debug logging is on
+    LOG.debug('headers=%s body=%s', request.headers, b)
+
+    return CustomORJSONResponse({
         'body': b.decode()
-    }
+    })
 
 
 @router.post("/genes")
@@ -377,51 +583,42 @@ async def genes_json(request: Request, response: Response):
     ret = {}
 
     try:
-        json_data = await request.json()
-
-        if 'release' in json_data:
-            release = json_data['release']
-        else:
-            raise Exception('release value is missing')
-
-        if 'species' in json_data:
-            species = json_data['species']
-        else:
-            raise Exception('species value is missing')
+        release, species, json_data = await json_release_species(request)
 
-        if 'ids' in json_data:
-            ids = json_data['ids']
-        elif 'ids[]' in json_data:
+        ids = json_data.get('ids')
+        if ids is None:
             # this is for backwards compatibility with ensimplR
-            ids = json_data['ids[]']
-        else:
+            ids = json_data.get('ids[]')
+        if ids is None:
             raise Exception('ids value is missing')
 
-        if 'details' in json_data:
-            details = utils.str2bool(json_data['details'])
-        else:
-            details = False
+        ids = valid_ids(ids)
+
+        details = utils.str2bool(json_data.get('details', False))
 
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
         ret['meta'] = meta.db_meta(db)
 
-        results = genesdb.get(db, ids=ids, details=details)
+        results = await run_in_threadpool(genesdb.get, db, ids=ids,
+                                          details=details)
 
         if len(results) == 0:
             raise Exception(f'No results found')
 
+        if len(results) > STREAM_MIN_ITEMS:
+            return stream_response(
+                ret, ('genes',), list(results.items()),
+                lambda item: dumps(item[0]) + b':' + dumps(item[1]), b'{}')
+
         ret['genes'] = results
     except JSONDecodeError as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {
+        return CustomORJSONResponse({
             'message': 'Received data is not a valid JSON',
             'detail': str(e)
-        }
+        }, status_code=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {
-            'message': str(e)
-        }
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
     return CustomORJSONResponse(ret)
 
@@ -437,17 +634,18 @@ async def genes_form(request: Request, response: Response,
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
         ret['meta'] = meta.db_meta(db)
 
-        results = genesdb.get(db, ids=ids, details=details)
+        results = await run_in_threadpool(genesdb.get, db, ids=ids,
+                                          details=details)
 
         if len(results) == 0:
             raise Exception(f'No results found')
 
         ret['genes'] = results
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
-    return ret
+    return CustomORJSONResponse(ret)
 
 
 @router.post("/external_ids")
@@ -490,50 +688,34 @@ async def external_ids(request: Request, response: Response):
     ret = {}
 
     try:
-        ids = None
-        release = None
-        species = None
-        source_db = None
+        release, species, json_data = await json_release_species(request)
 
-        json_data = await request.json()
-
-        if 'release' in json_data:
-            release = json_data['release']
-        else:
-            raise Exception('release value is missing')
-
-        if 'species' in json_data:
-            species = json_data['species']
-        else:
-            raise Exception('species value is missing')
-
-        if 'ids' in json_data:
-            ids = json_data['ids']
-        else:
+        ids = json_data.get('ids')
+        if ids is None:
             raise Exception('ids value is missing')
 
-        if 'source_db' in json_data:
-            source_db = json_data['source_db']
-        else:
-            source_db = 'Ensembl'
+        ids = valid_ids(ids)
+
+        source_db = json_data.get('source_db', 'Ensembl')
 
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
         ret['meta'] = meta.db_meta(db)
 
-        results = genesdb.get_ids(db, ids=ids, source_db=source_db)
+        results = await run_in_threadpool(genesdb.get_ids, db, ids=ids,
+                                          source_db=source_db)
 
         if len(results) == 0:
             raise Exception(f'No results found')
 
         ret['ids'] = results
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
     return CustomORJSONResponse(ret)
 
 
-@router.get("/search", response_class=UJSONResponse)
+@router.get("/search")
 async def search(request: Request, response: Response,
                  term: str, release: str, species: str,
                  exact: Optional[bool] = False, limit: Optional[int] = 100000,
@@ -603,10 +785,11 @@ async def search(request: Request, response: Response,
         :class:`flask.Response`: The response which is a JSON response.
     """
     ret = {}
+    dbs_dict = request.app.state.dbs_dict
 
     try:
         if not greedy:
-            db = dbs.get_database(release, species, request.app.state.dbs_dict, False)
+            db = dbs.get_database(release, species, dbs_dict, False)
 
             ret['meta'] = meta.db_meta(db)
 
@@ -625,17 +808,22 @@ async def search(request: Request, response: Response,
                 'matches': None
             }
 
-            results = searchdb.search(db, term, exact, limit)
+            results = await run_in_threadpool(searchdb.search, db, term,
+                                              exact, limit)
 
             if len(results.matches) == 0:
                 raise Exception(f'No results found for: {term}')
 
             ret['result']['num_results'] = results.num_results
             ret['result']['num_matches'] = results.num_matches
-            ret['result']['matches'] = []
-
-            for match in results.matches:
-                ret['result']['matches'].append(match.dict())
+            if len(results.matches) > STREAM_MIN_ITEMS:
+                return stream_response(ret, ('result', 'matches'),
+                                       results.matches,
+                                       lambda match: dumps(match.dict()))
+
+            ret['result']['matches'] = [
+                match.dict() for match in results.matches
+            ]
         else:
             from ensimpl.db.search import search, Match
 
@@ -644,8 +832,10 @@ async def search(request: Request, response: Response,
             #
             # get original results
             #
-            db_original = dbs.get_database(release, species, request.app.state.dbs_dict)
-            results_original = searchdb.search(db_original, term, exact)
+            db_original = dbs.get_database(release, species, dbs_dict)
+            results_original = await run_in_threadpool(searchdb.search,
+                                                       db_original, term,
+                                                       exact)
 
             ret['meta'] = meta.db_meta(db_original)
 
@@ -670,12 +860,10 @@ async def search(request: Request, response: Response,
             #
             # get greedy results and collect all ensembl_ids
             #
-            db_greedy = dbs.get_database(release,
-                                         species,
-                                         request.app.state.dbs_dict,
-                                         True)
+            db_greedy = dbs.get_database(release, species, dbs_dict, True)
 
-            results_greedy = search(db_greedy, term, False)
+            results_greedy = await run_in_threadpool(search, db_greedy, term,
+                                                     False)
 
             dict_greedy = {}
             for result in results_greedy.matches:
@@ -692,7 +880,8 @@ async def search(request: Request, response: Response,
             # # non existant ensembl_ids disappear
             #
             if len(ldiff) > 0:
-                genes = genesdb.get(db_original, ldiff)
+                genes = await run_in_threadpool(genesdb.get, db_original,
+                                                ldiff)
 
                 for eid in genes:
                     v = genes[eid]
@@ -737,7 +926,7 @@ async def search(request: Request, response: Response,
             try:
                 res = sorted(res, key=lambda x: x['score'], reverse=True)
             except Exception as e:
-                print('Error sorting', e)
+                LOG.error('Error sorting: %s', e)
 
             ret['result']['num_results'] = len(results_combined)
             ret['result']['num_matches'] = len(results_combined)
@@ -745,9 +934,9 @@ async def search(request: Request, response: Response,
             ret['result']['matches'] = res
 
     except Exception as e:
-        # TODO: better handling and logging
+        # TODO: better handling
         # response.status_code = status.HTTP_404_NOT_FOUND
-        print('Exception=', str(e))
+        LOG.debug('Search %s: %s', term, e)
 
     return CustomORJSONResponse(ret)
 
@@ -788,21 +977,16 @@ async def history(request: Request, response: Response,
             'release_end': release_end
         }
 
-        start_idx = -1
-        end_idx = 100000
-        for x, db in enumerate(request.app.state.dbs):
-            if db['species'] == species and db['release'] == release_start:
-                start_idx = max(x, start_idx)
-            if db['species'] == species and db['release'] == release_end:
-                end_idx = min(x, end_idx)
-
-        all_dbs = request.app.state.dbs[end_idx:start_idx + 1]
+        # an unknown release gives an empty range
+        dbs_index = request.app.state.dbs_index
+        start_idx = dbs_index.get((release_start, species), -1)
+        end_idx = dbs_index.get((release_end, species), 100000)
 
-        databases = []
-        for database in all_dbs:
-            databases.append(database['db'])
+        databases = request.app.state.species_dbs.get(species, [])
+        databases = databases[end_idx:start_idx + 1]
 
-        results = genesdb.get_history(databases, ensembl_id)
+        results = await run_in_threadpool(genesdb.get_history, databases,
+                                          ensembl_id)
 
         if len(results) == 0:
             raise Exception(f'No results found for: {ensembl_id}')
@@ -810,8 +994,8 @@ async def history(request: Request, response: Response,
         ret['history'] = results
 
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
     return CustomORJSONResponse(ret)
 
@@ -846,17 +1030,12 @@ async def external_dbs(request: Request, response: Response,
     element called ``message`` along with a status code of 500.
 
     """
-    ret = {}
-
     try:
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
-        ret['meta'] = meta.db_meta(db)
-        ret['external_dbs'] = meta.external_dbs(db)
+        return meta_response(request, db, 'external_dbs')
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
-
-    return CustomORJSONResponse(ret)
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
 
 @router.get("/randomids")
@@ -892,10 +1071,11 @@ async def randomids(request: Request, response: Response,
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
         ret['meta'] = meta.db_meta(db)
 
-        ret['ids'] = genesdb.random_ids(db, source_db, limit)
+        ret['ids'] = await run_in_threadpool(genesdb.random_ids, db,
+                                             source_db, limit)
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
     return CustomORJSONResponse(ret)
 
@@ -913,9 +1093,16 @@ async def exon_info(request: Request, response: Response,
     try:
         db = dbs.get_database(release, species, request.app.state.dbs_dict)
         ret['meta'] = meta.db_meta(db)
-        ret['genes'] = genesdb.get_exon_info(db, chrom, compress)
+        genes = await run_in_threadpool(genesdb.get_exon_info, db, chrom,
+                                        compress)
+
+        # every gene of the genome when no chromosome is given
+        if len(genes) > STREAM_MIN_ITEMS:
+            return stream_response(ret, ('genes',), genes, dumps)
+
+        ret['genes'] = genes
     except Exception as e:
-        response.status_code = status.HTTP_404_NOT_FOUND
-        return {'message': str(e)}
+        return CustomORJSONResponse({'message': str(e)},
+                                    status_code=status.HTTP_404_NOT_FOUND)
 
     return CustomORJSONResponse(ret)
@@ -1,18 +1,18 @@
 """Useful generic utilities for the package.
 """
-from collections import OrderedDict
-from functools import cmp_to_key
+from functools import lru_cache
 from operator import itemgetter as ig
 from typing import Any
 from typing import AnyStr
 from typing import Dict
 from typing import List
 from typing import Optional
-from typing import OrderedDict as OrderedDictTyping
+from typing import Tuple
 from urllib.request import urlopen
 
 import bz2
 import gzip
+import io
 import logging
 import os
 import random
@@ -20,14 +20,45 @@ import re
 import sqlite3
 import string
 
-REGEX_ENSEMBL_MOUSE_ID = re.compile('ENSMUS([EGTP])[0-9]{11}', re.IGNORECASE)
-REGEX_ENSEMBL_HUMAN_ID = re.compile('ENS([EGTP])[0-9]{11}', re.IGNORECASE)
-REGEX_MGI_ID = re.compile('MGI:[0-9]{1,}', re.IGNORECASE)
-REGEX_REGION = re.compile('(CHR|)*\s*([0-9]{1,2}|X|Y|MT)\s*(-|:)?\s*(\d+\.*\d*)\s*(MB|M|K|)?\s*(-|:|)?\s*(\d+\.*\d*|)\s*(MB|M|K|)?', re.IGNORECASE)
+REGEX_ENSEMBL_MOUSE_ID = re.compile(r'ENSMUS([EGTP])[0-9]{11}', re.IGNORECASE)
+REGEX_ENSEMBL_HUMAN_ID = re.compile(r'ENS([EGTP])[0-9]{11}', re.IGNORECASE)
+REGEX_MGI_ID = re.compile(r'MGI:[0-9]{1,}', re.IGNORECASE)
+
+# either of the Ensembl ids above in one pass
+REGEX_ENSEMBL_ID = re.compile(r'ENS(?:MUS)?[EGTP][0-9]{11}', re.IGNORECASE)
+
+# groups: chromosome, start, start multiplier, end, end multiplier; the
+# pattern is anchored, the start and end must be separated and there are
+# no nested quantifiers so it cannot backtrack
+REGEX_REGION = re.compile(
+    r'\A(?:CHR)?\s*([0-9]{1,2}|X|Y|MT)\s*[-:]?'
+    r'\s*(\d+(?:\.\d*)?)\s*(MB|KB|M|K)?\s*[-:\s]'
+    r'\s*(\d+(?:\.\d*)?)\s*(MB|KB|M|K)?\s*\Z', re.IGNORECASE)
+
+# first characters a region can start with, 'chr' or the chromosome
+REGION_START = frozenset('C0123456789XYMcxym')
+
+# no valid region is longer than this, longer strings are not matched
+REGION_MAX_LENGTH = 64
+
+# the multiplier of each region position unit
+MULTIPLIERS = {'mb': 1000000, 'm': 1000000, 'kb': 1000, 'k': 1000}
+
+# the protocols is_url accepts
+URL_PREFIXES = ('http://', 'https://', 'ftp://')
+
+# buffer size used by open_resource
+RESOURCE_BUFFER_SIZE = 1 << 18
+
+# values str2bool treats as True
+TRUE_STRINGS = frozenset(('true', '1', 't', 'y', 'yes'))
 
 logging.basicConfig(format='[Ensimpl] [%(asctime)s] %(message)s',
                     datefmt='%m/%d/%Y %I:%M:%S %p')
 
+# the level last set by configure_logging
+_LOG_LEVEL = None
+
 
 def get_logger() -> logging.Logger:
     """Get the logger.
@@ -55,15 +86,25 @@ def configure_logging(level: Optional[int] = 0) -> None:
     Args:
         The logging level; defaults to 0.
     """
+    global _LOG_LEVEL
+
     if level == 0:
-        get_logger().setLevel(logging.WARN)
+        log_level = logging.WARN
     elif level == 1:
-        get_logger().setLevel(logging.INFO)
+        log_level = logging.INFO
     elif level > 1:
-        get_logger().setLevel(logging.DEBUG)
+        log_level = logging.DEBUG
+    else:
+        return
+
+    if log_level == _LOG_LEVEL:
+        return
 
+    get_logger().setLevel(log_level)
+    _LOG_LEVEL = log_level
 
-def dictify_row(cursor: sqlite3.Cursor, row: sqlite3.Row) -> OrderedDictTyping:
+
+def dictify_row(cursor: sqlite3.Cursor, row: sqlite3.Row) -> Dict:
     """Turns the given row into a dict where the keys are the column names.
 
     Args:
@@ -71,17 +112,14 @@ def dictify_row(cursor: sqlite3.Cursor, row: sqlite3.Row) -> OrderedDictTyping:
         row (sqlite3.Row): The current row.
 
     Returns:
-        An OrderedDict where keys are column names.
+        A dict where keys are column names, in column order.
     """
-    d = OrderedDict()
-    for i, col in enumerate(cursor.description):
-        d[col[0]] = row[i]
-    return d
+    return dict(zip([col[0] for col in cursor.description], row))
 
 
-def dictify_cursor(cursor: sqlite3.Cursor) -> List[OrderedDictTyping]:
-    """All rows are converted into a :class:`collections.OrderedDict` where
-    keys are the column names.
+def dictify_cursor(cursor: sqlite3.Cursor) -> List[Dict]:
+    """All rows are converted into a ``dict`` where keys are the column
+    names, in column order.
 
     Args:
         cursor (sqlite3.Cursor): The database cursor.
@@ -90,7 +128,9 @@ def dictify_cursor(cursor: sqlite3.Cursor) -> List[OrderedDictTyping]:
         A list of dicts where keys are column names.
 
     """
-    return [dictify_row(cursor, row) for row in cursor]
+    # the column names are the same for every row
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
 
 
 def cmp(value_1: Any, value_2: Any) -> int:
@@ -120,7 +160,7 @@ def create_random_string(size: Optional[int] = 6,
     Returns:
         str: A random generated string.
     """
-    return ''.join(random.choice(chars) for _ in range(size))
+    return ''.join(random.choices(chars, k=size))
 
 
 def delete_file(file_name: str) -> None:
@@ -147,7 +187,7 @@ def format_time(start: float, end: float) -> str:
     """
     hours, rem = divmod(end-start, 3600)
     minutes, seconds = divmod(rem, 60)
-    return f'{int(hours):0>2}:{int(minutes):0>2}:{int(seconds):05.2f}'
+    return '%02d:%02d:%05.2f' % (hours, minutes, int(seconds))
 
 
 def get_file_name(url: str, directory: Optional[str] = None) -> AnyStr:
@@ -165,8 +205,8 @@ def get_file_name(url: str, directory: Optional[str] = None) -> AnyStr:
     Returns:
         The full path of file.
     """
-    download_file_name = url.split('/')[-1]
-    local_directory = directory if directory else os.getcwd()
+    download_file_name = url.rpartition('/')[2]
+    local_directory = directory or os.getcwd()
     return os.path.abspath(os.path.join(local_directory, download_file_name))
 
 
@@ -179,10 +219,7 @@ def is_url(url: str) -> bool:
     Returns:
         True if `url` has a valid protocol, False otherwise.
     """
-    if url and url.startswith(('http://', 'https://', 'ftp://')):
-        return True
-
-    return False
+    return bool(url) and url.startswith(URL_PREFIXES)
 
 
 def merge_two_dicts(x: dict, y: dict) -> Dict:
@@ -195,9 +232,8 @@ def merge_two_dicts(x: dict, y: dict) -> Dict:
     Returns:
         The merged dictionary.
     """
-    z = x.copy()
-    z.update(y)
-    return z
+    # dict | dict needs Python 3.9, the Docker image runs 3.8
+    return {**x, **y}
 
 
 def multikeysort(items: List[Dict], columns: List[str]) -> List[Dict]:
@@ -232,20 +268,18 @@ def multikeysort(items: List[Dict], columns: List[str]) -> List[Dict]:
         list: The sorted ``list``.
 
     """
-    comparers = [
-        ((ig(col[1:].strip()), -1) if col.startswith('-') else (
-        ig(col.strip()), 1))
-        for col in columns
-    ]
+    # sorting is stable, so sorting by each column from the last to the
+    # first orders by all of them, each key is computed once per item
+    # rather than once per comparison
+    sorted_items = list(items)
 
-    def comparer(left, right):
-        comparer_iter = (
-            cmp(fn(left), fn(right)) * mult
-            for fn, mult in comparers
-        )
-        return next((result for result in comparer_iter if result), 0)
+    for col in reversed(columns):
+        if col.startswith('-'):
+            sorted_items.sort(key=ig(col[1:].strip()), reverse=True)
+        else:
+            sorted_items.sort(key=ig(col.strip()))
 
-    return sorted(items, key=cmp_to_key(comparer))
+    return sorted_items
 
 
 def open_resource(resource: str, mode: Optional[str] = 'rb'):
@@ -266,13 +300,20 @@ def open_resource(resource: str, mode: Optional[str] = 'rb'):
         return resource
 
     if resource.endswith(('.gz', '.Z', '.z')):
-        return gzip.open(resource, mode)
+        handle = gzip.open(resource, mode)
     elif resource.endswith(('.bz', '.bz2', '.bzip2')):
-        return bz2.BZ2File(resource, mode)
-    elif resource.startswith(('http://', 'https://', 'ftp://')):
-        return urlopen(resource)
+        handle = bz2.BZ2File(resource, mode)
+    elif is_url(resource):
+        handle = urlopen(resource)
     else:
-        return open(resource, mode)
+        return open(resource, mode, buffering=RESOURCE_BUFFER_SIZE)
+
+    # read the decompressed or downloaded data in large blocks rather than
+    # one small read per line
+    if 'b' in mode and 'r' in mode:
+        return io.BufferedReader(handle, buffer_size=RESOURCE_BUFFER_SIZE)
+
+    return handle
 
 
 def str2bool(val: str) -> bool:
@@ -287,7 +328,10 @@ def str2bool(val: str) -> bool:
     Returns:
         True val represents a boolean True
     """
-    return str(val).lower() in ['true', '1', 't', 'y', 'yes']
+    if isinstance(val, bool):
+        return val
+
+    return str(val).lower() in TRUE_STRINGS
 
 
 class Region:
@@ -298,11 +342,21 @@ class Region:
         start_position (int): The start position.
         end_position (int): The end position.
     """
-    def __init__(self):
-        """Initialization."""
-        self.chromosome: str
-        self.start_position: int
-        self.end_position: int
+    __slots__ = ('chromosome', 'start_position', 'end_position')
+
+    def __init__(self, chromosome: Optional[str] = None,
+                 start_position: Optional[int] = None,
+                 end_position: Optional[int] = None):
+        """Initialization.
+
+        Args:
+            chromosome: The chromosome name.
+            start_position: The start position.
+            end_position: The end position.
+        """
+        self.chromosome = chromosome
+        self.start_position = start_position
+        self.end_position = end_position
 
     def __str__(self):
         """Return string representing this region.
@@ -318,8 +372,7 @@ class Region:
         Returns:
             str: The keys being the attributes.
         """
-        return (f'{self.__class__}({self.chromosome}:'
-                f'{self.start_position}-{self.end_position})')
+        return f'{type(self).__name__}({self})'
 
 
 def nvl(value: Any, default: Any) -> Any:
@@ -332,7 +385,7 @@ def nvl(value: Any, default: Any) -> Any:
     Returns:
         Either `value` or `default`.
     """
-    return value if value else default
+    return value or default
 
 
 def nvli(value, default) -> int:
@@ -345,36 +398,32 @@ def nvli(value, default) -> int:
     Returns:
         Either `value` or `default`.
     """
-    ret = default
-    if value:
-        try:
-            ret = int(value)
-        except ValueError:
-            pass
-    return ret
+    if not value:
+        return default
+
+    # ints, such as a search limit, need no conversion
+    if type(value) is int:
+        return value
+
+    try:
+        return int(value)
+    except ValueError:
+        return default
 
 
 def get_multiplier(factor: str) -> int:
     """Get multiplying factor.
 
-    The factor value should be 'mb', 'm', or 'k' and the correct multiplier
-    will be returned.
+    The factor value should be 'mb', 'm', 'kb' or 'k' and the correct
+    multiplier will be returned.
 
     Args:
-        factor: One of 'mb', 'm', or 'k'.
+        factor: One of 'mb', 'm', 'kb' or 'k'.
 
     Returns:
-        The multiplying value.
+        The multiplying value, 1 for anything else.
     """
-    if factor:
-        factor = factor.lower()
-
-        if factor == 'mb':
-            return 1000000
-        elif factor == 'kb':
-            return 1000
-
-    return 1
+    return MULTIPLIERS.get(factor.lower(), 1) if factor else 1
 
 
 def str_to_region(location: str) -> Region:
@@ -386,6 +435,24 @@ def str_to_region(location: str) -> Region:
     Returns:
         A Region object.
 
+    Raises:
+        ValueError: If `location` is invalid.
+    """
+    # a new Region each time, the parsed values are cached
+    return Region(*_parse_region(location))
+
+
+@lru_cache(maxsize=4096)
+def _parse_region(location: str) -> Tuple:
+    """Parse a string into the parts of a genomic location, see
+    :func:`str_to_region`.
+
+    Args:
+        location: The genomic location (range).
+
+    Returns:
+        A tuple of the chromosome, start position and end position.
+
     Raises:
         ValueError: If `location` is invalid.
     """
@@ -394,42 +461,31 @@ def str_to_region(location: str) -> Region:
 
     valid_location = location.strip()
 
-    if ('-' not in valid_location) and (' ' not in valid_location) and \
-            (':' not in valid_location):
-        raise ValueError('Incorrect location format')
-
     if len(valid_location) <= 0:
         raise ValueError('Empty location')
 
+    if len(valid_location) > REGION_MAX_LENGTH:
+        raise ValueError('Location too long')
+
+    # the pattern requires a separator between the start and end
     match = REGEX_REGION.match(valid_location)
 
     if not match:
         raise ValueError('Invalid location string')
 
-    loc = Region()
-    loc.chromosome = match.group(2)
-    loc.start_position = match.group(4)
-    loc.end_position = match.group(7)
-    multiplier_one = match.group(5)
-    multiplier_two = match.group(8)
+    chromosome, start, multiplier_one, end, multiplier_two = match.groups()
 
-    if '.' in loc.start_position:
-        loc.start_position = float(loc.start_position)
-    else:
-        loc.start_position = int(loc.start_position)
-
-    if '.' in loc.end_position:
-        loc.end_position = float(loc.end_position)
-    else:
-        loc.end_position = int(loc.end_position)
+    start_position = float(start) if '.' in start else int(start)
+    end_position = float(end) if '.' in end else int(end)
 
+    # the pattern only captures known units, see get_multiplier
     if multiplier_one:
-        loc.start_position *= get_multiplier(multiplier_one)
+        start_position *= MULTIPLIERS[multiplier_one.lower()]
 
     if multiplier_two:
-        loc.end_position *= get_multiplier(multiplier_two)
+        end_position *= MULTIPLIERS[multiplier_two.lower()]
 
-    return loc
+    return chromosome, start_position, end_position
 
 
 def is_valid_region(term: str) -> bool:
@@ -441,23 +497,23 @@ def is_valid_region(term: str) -> bool:
     Returns:
         True if valid region, False otherwise
     """
-    try:
-        if ('-' not in term) and (' ' not in term) and (':' not in term):
-            raise ValueError('not correct format')
-
-        region = str_to_region(term)
+    valid_term = term.lstrip() if term else ''
 
-        if region.chromosome is None or \
-                region.start_position is None or \
-                region.end_position is None:
-            return False
+    # most terms are symbols or ids, skip the pattern when the first
+    # character cannot start a region
+    if not valid_term or valid_term[0] not in REGION_START:
+        return False
 
-    except ValueError as ve:
+    # a match always has the chromosome, start and end
+    try:
+        _parse_region(term)
+    except ValueError:
         return False
 
     return True
 
 
+@lru_cache(maxsize=8192)
 def validate_ensembl_id(ensembl_id: str) -> str:
     """Validate an id to make sure it conforms to the convention.
 
@@ -478,9 +534,7 @@ def validate_ensembl_id(ensembl_id: str) -> str:
     if len(valid_id) <= 0:
         raise ValueError('Empty Ensembl ID')
 
-    if REGEX_ENSEMBL_HUMAN_ID.match(valid_id):
-        return valid_id
-    elif REGEX_ENSEMBL_MOUSE_ID.match(valid_id):
+    if REGEX_ENSEMBL_ID.match(valid_id):
         return valid_id
 
     raise ValueError(f'Invalid Ensembl ID: {ensembl_id}')
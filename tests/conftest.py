@@ -0,0 +1,111 @@
+import sqlite3
+
+import pytest
+
+import ensimpl.create.ensimpl_db as ensimpl_db
+from ensimpl.db import dbs
+
+
+def build_db(filename, genes, release='99', species='Mm',
+             assembly='GRCm39'):
+    """Build a small ensimpl database with the builder's schema.
+
+    Args:
+        filename: The database file to create.
+        genes: A list of dicts with the keys ``id``, ``symbol`` and
+            optionally ``lookups``, a list of (value, ranking_id) tuples,
+            ``homologs``, a list of (homolog_id, homolog_symbol) tuples, and
+            ``exons``, a list of (start, end) tuples.
+        release: The Ensembl release.
+        species: The species identifier.
+        assembly: The assembly.
+
+    Returns:
+        The database file.
+    """
+    conn = sqlite3.connect(filename)
+
+    for sql in ensimpl_db.SQL_CREATE_TABLES + ensimpl_db.SQL_TABLES_INITIALIZE:
+        conn.execute(sql)
+
+    for key, value in (('release', release), ('assembly', assembly),
+                       ('assembly_patch', f'{assembly}.p1'), ('url', 'x')):
+        conn.execute('INSERT INTO meta_info VALUES (null, ?, ?, ?)',
+                     (key, value, species))
+
+    for key, value in ensimpl_db.EXTERNAL_DATABASES.items():
+        conn.execute('INSERT INTO external_dbs VALUES (null, ?, ?, ?)',
+                     (key, value['display'], value['id']))
+
+    conn.execute('INSERT INTO chromosomes VALUES (null, 1, ?, ?, ?)',
+                 ('1', len(genes) * 1000, species))
+
+    lookups = []
+
+    for position, gene in enumerate(genes):
+        gene_id = gene['id']
+        symbol = gene['symbol']
+        homologs = gene.get('homologs', [])
+        homolog_text = '||'.join(f'{h_id}.1/{h_symbol}'
+                                 for h_id, h_symbol in homologs) or None
+
+        conn.execute('INSERT INTO ensembl_genes '
+                     'VALUES (null, ?, 1, ?, ?, ?, null, null, ?, ?, ?, 1, ?)',
+                     (gene_id, species, symbol, f'name {symbol}', '1',
+                      position * 1000 + 1, position * 1000 + 500,
+                      homolog_text))
+        conn.execute('INSERT INTO ensembl_gene_ids VALUES (null, ?, ?, ?, ?)',
+                     (gene_id, gene_id, 'Ensembl', species))
+        conn.execute('INSERT INTO ensembl_gtpe '
+                     'VALUES (null, ?, ?, null, ?, 1, ?, ?, ?, ?, 1, null, ?)',
+                     (species, gene_id, gene_id, symbol, '1',
+                      position * 1000 + 1, position * 1000 + 500, 'EG'))
+
+        for number, (start, end) in enumerate(gene.get('exons', []), 1):
+            conn.execute('INSERT INTO ensembl_gtpe '
+                         'VALUES (null, ?, ?, null, ?, 1, null, ?, ?, ?, 1, '
+                         '?, ?)',
+                         (species, gene_id, f'{gene_id}E{number}', '1', start,
+                          end, number, 'EE'))
+
+        # the builder writes each homolog to both tables
+        for h_id, h_symbol in homologs:
+            conn.execute('INSERT INTO ensembl_gene_ids '
+                         'VALUES (null, ?, ?, ?, ?)',
+                         (gene_id, h_id, 'Ensembl_homolog', species))
+            conn.execute('INSERT INTO ensembl_homologs (ensembl_id, '
+                         'ensembl_version, ensembl_symbol, homolog_id, '
+                         'homolog_version, homolog_symbol, '
+                         'homolog_species_id, description, species_id) '
+                         'VALUES (?, 1, ?, ?, 1, ?, ?, ?, ?)',
+                         (gene_id, symbol, h_id, h_symbol, 'Hs',
+                          'ortholog_one2one', species))
+
+        lookups.append((gene_id, gene_id, 'EG'))
+        lookups.append((gene_id, symbol, 'GS'))
+        lookups.extend((gene_id, value, ranking_id)
+                       for value, ranking_id in gene.get('lookups', []))
+
+    conn.executemany('INSERT INTO ensembl_genes_lookup '
+                     'VALUES (null, ?, ?, ?, ?)',
+                     [lookup + (species,) for lookup in lookups])
+    conn.execute(ensimpl_db.SQL_ENSEMBL_SEARCH_INSERT)
+
+    for sql in ensimpl_db.SQL_INDICES + ensimpl_db.SQL_TABLES_DROP:
+        conn.execute(sql)
+
+    conn.commit()
+    conn.close()
+
+    return str(filename)
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """Build databases under a temporary directory, see :func:`build_db`."""
+    def make(genes, name='ensimpl.99.Mm.db3', **kwargs):
+        return build_db(tmp_path / name, genes, **kwargs)
+
+    yield make
+
+    dbs.close_connections()
@@ -0,0 +1,55 @@
+import asyncio
+
+import orjson
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from ensimpl.fastapi_utils import GZipCompressionMiddleware
+from ensimpl.routers import api
+
+
+def body(response):
+    async def read():
+        return b''.join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(read())
+
+
+def test_stream_response():
+    # the term echoes the old placeholder and comes before the matches
+    content = {'request': {'term': '\x00items\x00'},
+               'result': {'num_results': 3, 'matches': None, 'other': 1}}
+    items = [{'id': i} for i in range(5)]
+
+    response = api.stream_response(content, ('result', 'matches'), items,
+                                   api.dumps)
+
+    content['result']['matches'] = items
+    assert orjson.loads(body(response)) == content
+
+
+def test_stream_response_dict():
+    items = [('a', 1), ('b', 2)]
+
+    response = api.stream_response(
+        {'meta': {}}, ('genes',), items,
+        lambda item: api.dumps(item[0]) + b':' + api.dumps(item[1]), b'{}')
+
+    assert body(response) == b'{"meta":{},"genes":{"a":1,"b":2}}'
+
+
+def test_gzip_compression_levels():
+    text = 'ensimpl ' * 1000
+
+    for level in (1, 3, 6, 9):
+        app = FastAPI()
+        app.add_middleware(GZipCompressionMiddleware, minimum_size=10,
+                           compression_level=level)
+        app.get('/')(lambda: PlainTextResponse(text))
+
+        response = TestClient(app).get('/',
+                                       headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.text == text
@@ -0,0 +1,22 @@
+import os
+
+from ensimpl.db import dbs
+from ensimpl.db import meta
+
+
+GENES = [{'id': 'ENSMUSG00000000001', 'symbol': 'Gnai3'}]
+
+
+def test_replaced_db_is_reopened(make_db):
+    db = make_db(GENES, assembly='GRCm38')
+
+    assert meta.db_meta(db)['assembly'] == 'GRCm38'
+
+    # the connection to the old file is still open when it is replaced
+    new_db = make_db(GENES, name='new.db3', assembly='GRCm39')
+    os.replace(new_db, db)
+
+    assert meta.db_meta(db)['assembly'] == 'GRCm39'
+    assert dbs.get_connection(db).execute(
+        "SELECT meta_value FROM meta_info WHERE meta_key = 'assembly'"
+    ).fetchone()[0] == 'GRCm39'
@@ -0,0 +1,62 @@
+import random
+
+from ensimpl.db import genes
+
+
+GENES = [
+    {'id': 'ENSMUSG00000000001', 'symbol': 'Abc1',
+     'homologs': [('ENSG00000000001', 'ABC1')]},
+    {'id': 'ENSMUSG00000000002', 'symbol': 'Abc2'},
+]
+
+
+def test_get_ids_homologs_once(make_db):
+    db = make_db(GENES)
+
+    ids = genes.get_ids(db, ['ENSMUSG00000000001'])
+    assert ids['ENSMUSG00000000001']['Ensembl_homolog'] == ['ENSG00000000001']
+
+    ids = genes.get_ids(db)
+    assert ids['ENSMUSG00000000001']['Ensembl_homolog'] == ['ENSG00000000001']
+    assert 'Ensembl_homolog' not in ids['ENSMUSG00000000002']
+
+    ids = genes.get_ids(db, ['ENSG00000000001'], 'Ensembl_homolog')
+    assert ids['ENSG00000000001']['Ensembl_homolog'] == ['ENSG00000000001']
+
+
+def test_get_history(make_db):
+    databases = [make_db(GENES, name=f'ensimpl.{release}.Mm.db3',
+                         release=release)
+                 for release in ('98', '99')]
+
+    for _ in range(2):
+        history = genes.get_history(databases, 'ENSMUSG00000000002')
+
+        assert sorted(history) == ['98', '99']
+        assert history['99']['symbol'] == 'Abc2'
+
+
+def test_get_exon_info(make_db):
+    db = make_db([{'id': 'ENSMUSG00000000001', 'symbol': 'Abc1',
+                   'exons': [(101, 200), (150, 250), (301, 400)]},
+                  {'id': 'ENSMUSG00000000002', 'symbol': 'Abc2'}])
+
+    exon_info = genes.get_exon_info(db)
+    assert [gene['exons'] for gene in exon_info] == [[100, 149, 51, 99], []]
+
+    exon_info = genes.get_exon_info(db, compress=True)
+    assert [gene[6] for gene in exon_info] == ['100,149,51,99', '']
+
+
+def test_exon_rle():
+    rng = random.Random(0)
+
+    for _ in range(500):
+        reference = rng.randint(0, 100)
+        exon_starts = [rng.randint(reference, reference + 1000)
+                       for _ in range(rng.randint(0, 12))]
+        exon_ends = [start + rng.randint(0, 200) for start in exon_starts]
+
+        assert genes.exon_rle(reference, exon_starts, exon_ends) == \
+            genes.run_length_encode(
+                reference, genes.compute_union(exon_starts, exon_ends))
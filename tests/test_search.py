@@ -0,0 +1,35 @@
+from ensimpl.db import search
+
+
+def test_fts5_term_splits_on_separators():
+    assert search.fts5_term('MGI:9003') == '"MGI" "9003"'
+    assert search.fts5_term('Gene1.5*') == '"Gene1" "5"*'
+
+
+def test_search_term_with_punctuation(make_db):
+    db = make_db([{'id': 'ENSMUSG00000000001', 'symbol': 'Gnai3',
+                   'lookups': [('gene Gene1 protein 51', 'GN')]}])
+
+    result = search.search(db, 'Gene1.5', exact=False)
+
+    assert [match.ensembl_gene_id for match in result.matches] == \
+        ['ENSMUSG00000000001']
+
+
+def test_search_order(make_db):
+    db = make_db([
+        {'id': 'ENSMUSG00000000001', 'symbol': 'Ccc',
+         'lookups': [('Xyz1', 'GY')]},
+        {'id': 'ENSMUSG00000000002', 'symbol': 'Bbb',
+         'lookups': [('Xyz1', 'TS')]},
+        {'id': 'ENSMUSG00000000003', 'symbol': 'Aaa',
+         'lookups': [('Xyz1', 'HG')]},
+        {'id': 'ENSMUSG00000000004', 'symbol': 'Xyz1'},
+    ])
+
+    result = search.search(db, 'Xyz1')
+
+    # HG is ranked both as HGNC (8400) and as a homolog id (5500), the best
+    # ranking wins, then the symbol, the synonym and the transcript symbol
+    assert [(match.symbol, match.score) for match in result.matches] == \
+        [('Aaa', 8384), ('Xyz1', 5977), ('Ccc', 5676), ('Bbb', 5471)]